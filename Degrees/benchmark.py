@@ -0,0 +1,113 @@
+import argparse
+import random
+import time
+
+import degrees
+from util import Node, QueueFrontier, DequeFrontier
+
+
+def generate_graph(edges, stars_per_movie=4, seed=0):
+    """
+    Fill `degrees.people` and `degrees.movies` with a synthetic co-star
+    graph of roughly `edges` co-star pairs.
+
+    Every movie casts `stars_per_movie` people, which links each pair of
+    them, so the number of movies is chosen to reach the requested
+    number of pairs. People are drawn with a skewed distribution so a
+    few of them star in many movies, as in the IMDb data.
+    """
+    rng = random.Random(seed)
+    pairs_per_movie = stars_per_movie * (stars_per_movie - 1) // 2
+    num_movies = max(1, edges // pairs_per_movie)
+    num_people = max(stars_per_movie, num_movies * stars_per_movie // 6)
+
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+    for i in range(num_people):
+        degrees.people[str(i)] = {
+            "name": f"Person {i}",
+            "birth": "",
+            "movies": set()
+        }
+
+    for i in range(num_movies):
+        movie_id = f"m{i}"
+        stars = set()
+        while len(stars) < stars_per_movie:
+            stars.add(str(int(num_people * rng.random() ** 2)))
+        degrees.movies[movie_id] = {
+            "title": f"Movie {i}",
+            "year": "",
+            "stars": stars
+        }
+        for person_id in stars:
+            degrees.people[person_id]["movies"].add(movie_id)
+
+    return num_people, num_movies
+
+
+def explore(source, frontier, use_explored, deadline):
+    """
+    Run breadth-first search from `source` over the whole component
+    using `frontier`, as `shortest_path` does for an unreachable target.
+    Returns the number of expanded nodes and whether the search
+    finished before `deadline`.
+    """
+    frontier.add(Node(state=source, parent=None, action=None))
+    explored = set()
+    expanded = 0
+
+    while not frontier.empty():
+        if time.perf_counter() > deadline:
+            return expanded, False
+        node = frontier.remove()
+        expanded += 1
+        if use_explored:
+            explored.add(node.state)
+        for action, state in degrees.neighbors_for_person(node.state):
+            if not frontier.contains_state(state) and state not in explored:
+                frontier.add(Node(state=state, parent=node, action=action))
+
+    return expanded, True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare Degrees frontiers on a synthetic co-star graph."
+    )
+    parser.add_argument("--edges", type=int, default=1_000_000,
+                        help="approximate number of co-star pairs")
+    parser.add_argument("--timeout", type=float, default=30,
+                        help="seconds allowed for each search")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("Generating graph...")
+    num_people, num_movies = generate_graph(args.edges, seed=args.seed)
+    print(f"{num_people} people, {num_movies} movies.")
+
+    # Start from the best connected person so the search covers the
+    # giant component
+    source = max(degrees.people,
+                 key=lambda person_id: len(degrees.people[person_id]["movies"]))
+
+    frontiers = [
+        ("QueueFrontier", lambda: QueueFrontier(), True),
+        ("DequeFrontier", lambda: DequeFrontier(), True),
+        ("DequeFrontier(mark_visited)",
+         lambda: DequeFrontier(mark_visited=True), False),
+    ]
+    for label, make_frontier, use_explored in frontiers:
+        start = time.perf_counter()
+        expanded, finished = explore(
+            source, make_frontier(), use_explored, start + args.timeout
+        )
+        elapsed = time.perf_counter() - start
+        status = "finished" if finished else "timed out"
+        print(f"{label}: {expanded} nodes in {elapsed:.2f}s "
+              f"({expanded / elapsed:.0f} nodes/s, {status})")
+
+
+if __name__ == "__main__":
+    main()
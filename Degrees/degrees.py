@@ -1,7 +1,13 @@
+import argparse
 import csv
+import heapq
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import load_graph
+from landmarks import load_index
+from nameindex import NameIndex
+from service import run_batch, serve
+from util import Node, DequeFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -53,23 +59,76 @@ def load_data(directory):
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two actors."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--csr", action="store_true",
+                        help="search a compact integer-indexed graph")
+    parser.add_argument("--cache", action="store_true",
+                        help="load the compact graph from a snapshot, "
+                             "rebuilding it when the CSV files change")
+    parser.add_argument("--landmarks", metavar="FILE",
+                        help="search with A* guided by the landmark index in "
+                             "FILE, building and saving it if missing or "
+                             "built from other data")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer tab-separated name pairs from FILE "
+                             "(- for stdin) as JSON lines")
+    parser.add_argument("--serve", metavar="PORT", type=int,
+                        help="answer queries over HTTP on localhost:PORT")
+    args = parser.parse_args()
+
+    # The landmark index is over the dictionaries loaded by `load_data`,
+    # which the compact graph, batch and server modes do not use
+    if args.landmarks and (args.csr or args.cache or args.batch or args.serve):
+        parser.error("--landmarks cannot be combined with --csr, --cache, "
+                     "--batch or --serve")
+
+    # Batch and server modes load the compact graph once for all queries
+    if args.batch or args.serve:
+        print("Loading data...", file=sys.stderr)
+        graph = load_graph(args.directory, cache=args.cache)
+        index = NameIndex.from_graph(graph)
+        print("Data loaded.", file=sys.stderr)
+        if args.serve:
+            serve(graph, port=args.serve, index=index)
+        elif args.batch == "-":
+            run_batch(graph, sys.stdin, sys.stdout, index)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(graph, f, sys.stdout, index)
+        return
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    if args.csr or args.cache:
+        graph = load_graph(args.directory, cache=args.cache)
+        search = graph.shortest_path
+        person_name = graph.person_name
+        movie_title = graph.movie_title
+    else:
+        load_data(args.directory)
+        graph = None
+        search = shortest_path_bidirectional
+        if args.landmarks:
+            index = load_index(args.landmarks, args.directory, people,
+                               neighbors_for_person)
+            search = lambda source, target: shortest_path_astar(
+                source, target, index
+            )
+        person_name = lambda person_id: people[person_id]["name"]
+        movie_title = lambda movie_id: movies[movie_id]["title"]
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    source = person_id_for_name(input("Name: "), graph)
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = person_id_for_name(input("Name: "), graph)
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = search(source, target)
 
     if path is None:
         print("Not connected.")
@@ -78,9 +137,9 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_name(path[i][1])
+            person2 = person_name(path[i + 1][1])
+            movie = movie_title(path[i + 1][0])
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
@@ -92,10 +151,11 @@ def shortest_path(source, target):
     If no possible path, returns None.
     """
     start = Node(state=source, parent=None, action=None)
-    frontier = QueueFrontier()
-    frontier.add(start)
 
-    explored = set()
+    # Every person stays marked once added, so the frontier also
+    # tracks who has already been explored
+    frontier = DequeFrontier(mark_visited=True)
+    frontier.add(start)
 
     # Keep looping until solution found
     while True:
@@ -115,30 +175,260 @@ def shortest_path(source, target):
             path.reverse()
             return path
 
-        # Mark node as explored
-        explored.add(node.state)
-
         # Add neighbors to frontier
         for action, state in neighbors_for_person(node.state):
-            if not frontier.contains_state(state) and state not in explored:
+            if not frontier.contains_state(state):
                 child = Node(state=state, parent=node, action=action)
                 frontier.add(child)
    
 
-def person_id_for_name(name):
+
+def shortest_path_bidirectional(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching breadth-first
+    from both ends at once and stopping where the two searches meet.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Each side maps a reached person_id to the (movie_id, person_id)
+    # step that leads back towards the side's own starting person
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+
+    # Keep looping until one side runs out of people to expand
+    while forward_layer and backward_layer:
+
+        # Expand a whole layer of the smaller side, so both searches
+        # grow at roughly the same rate
+        if len(forward_layer) <= len(backward_layer):
+            layer, reached, other = forward_layer, forward, backward
+        else:
+            layer, reached, other = backward_layer, backward, forward
+
+        next_layer = []
+        for person_id in layer:
+            for movie_id, neighbor in neighbors_for_person(person_id):
+                if neighbor in reached:
+                    continue
+                reached[neighbor] = (movie_id, person_id)
+
+                # The first meeting point found while expanding whole
+                # layers always lies on a shortest path
+                if neighbor in other:
+                    return join_paths(forward, backward, neighbor)
+                next_layer.append(neighbor)
+
+        if reached is forward:
+            forward_layer = next_layer
+        else:
+            backward_layer = next_layer
+
+    return None
+
+
+def join_paths(forward, backward, meeting):
+    """
+    Returns the (movie_id, person_id) path through `meeting`, given the
+    parent maps built by the forward and backward searches.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, child = backward[person_id]
+        path.append((movie_id, child))
+        person_id = child
+    return path
+
+
+def shortest_path_astar(source, target, index):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using A* search with
+    lower bounds from a `LandmarkIndex` as the heuristic.
+
+    If no possible path, returns None.
+    """
+    lower, _ = index.bounds(source, target)
+    if lower is None:
+        return None
+
+    # Entries are ordered by estimated total length, preferring deeper
+    # nodes on ties; the counter keeps nodes themselves from being compared
+    start = Node(state=source, parent=None, action=None)
+    frontier = [(lower, 0, 0, start)]
+    distances = {source: 0}
+    counter = 1
+
+    while frontier:
+        _, depth, _, node = heapq.heappop(frontier)
+        depth = -depth
+
+        # If node is the goal, then we have a solution
+        if node.state == target:
+            path = []
+            while node.parent is not None:
+                path.append((node.action, node.state))
+                node = node.parent
+            path.reverse()
+            return path
+
+        # Skip entries superseded by a shorter route
+        if depth > distances[node.state]:
+            continue
+
+        for action, state in neighbors_for_person(node.state):
+            if depth + 1 < distances.get(state, depth + 2):
+                distances[state] = depth + 1
+                child = Node(state=state, parent=node, action=action)
+                estimate = depth + 1 + index.lower_bound(state, target)
+                heapq.heappush(frontier, (estimate, -depth - 1, counter, child))
+                counter += 1
+
+    return None
+
+
+def shortest_path_parents(source, target):
+    """
+    Breadth-first search from the source that records, for everyone no
+    further away than the target, every (movie_id, person_id) pair that
+    reaches them along a shortest path.
+
+    Returns that dictionary, or None if the target is not connected.
+    """
+    parents = {source: []}
+    distances = {source: 0}
+    layer = [source]
+
+    # Finish the target's layer so that all of its parents are recorded
+    while layer and target not in parents:
+        next_layer = []
+        for person_id in layer:
+            distance = distances[person_id] + 1
+            for movie_id, neighbor in neighbors_for_person(person_id):
+                if neighbor not in distances:
+                    distances[neighbor] = distance
+                    parents[neighbor] = []
+                    next_layer.append(neighbor)
+                if distances[neighbor] == distance:
+                    parents[neighbor].append((movie_id, person_id))
+        layer = next_layer
+
+    return parents if target in parents else None
+
+
+def all_shortest_paths(source, target):
+    """
+    Generates every distinct shortest list of (movie_id, person_id)
+    pairs that connect the source to the target, one at a time.
+
+    Generates nothing if the two are not connected.
+    """
+    parents = shortest_path_parents(source, target)
+    if parents is None:
+        return
+
+    # Walk back from the target, each entry holding a path suffix in
+    # reverse order
+    stack = [(target, [])]
+    while stack:
+        person_id, suffix = stack.pop()
+        if person_id == source:
+            yield suffix[::-1]
+            continue
+        for movie_id, parent in parents[person_id]:
+            stack.append((parent, suffix + [(movie_id, person_id)]))
+
+
+def ranked_shortest_paths(source, target, cost):
+    """
+    Generates the shortest paths from the source to the target in order
+    of increasing total `cost(movie_id)` over their movies, so that the
+    first k are the top k without enumerating the rest.
+    """
+    parents = shortest_path_parents(source, target)
+    if parents is None:
+        return
+
+    # Lowest cost of any shortest path from the source to each person,
+    # which makes the search below expand only paths that can be next
+    lowest = {source: 0}
+
+    def lowest_cost(person_id):
+        if person_id not in lowest:
+            lowest[person_id] = min(
+                lowest_cost(parent) + cost(movie_id)
+                for movie_id, parent in parents[person_id]
+            )
+        return lowest[person_id]
+
+    # Entries hold the lowest total cost of any path with this suffix;
+    # the counter keeps suffixes themselves from being compared
+    frontier = [(lowest_cost(target), 0, 0, target, [])]
+    counter = 1
+    while frontier:
+        _, suffix_cost, _, person_id, suffix = heapq.heappop(frontier)
+        if person_id == source:
+            yield suffix[::-1]
+            continue
+        for movie_id, parent in parents[person_id]:
+            parent_cost = suffix_cost + cost(movie_id)
+            heapq.heappush(frontier, (
+                lowest_cost(parent) + parent_cost, parent_cost, counter,
+                parent, suffix + [(movie_id, person_id)]
+            ))
+            counter += 1
+
+
+def movie_recency(movie_id):
+    """
+    Cost for `ranked_shortest_paths` that prefers the newest movies.
+    """
+    year = movies[movie_id]["year"]
+    return -int(year) if year.isdigit() else 0
+
+
+def movie_popularity(movie_id):
+    """
+    Cost for `ranked_shortest_paths` that prefers movies with the most stars.
+    """
+    return -len(movies[movie_id]["stars"])
+
+
+def person_id_for_name(name, graph=None):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    Looks the name up in `graph` if given, else in the loaded dictionaries.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    if graph is None:
+        person_ids = list(names.get(name.lower(), set()))
+    else:
+        person_ids = graph.person_ids_for_name(name)
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
+            if graph is None:
+                name = people[person_id]["name"]
+                birth = people[person_id]["birth"]
+            else:
+                name = graph.person_name(person_id)
+                birth = graph.person_birth(person_id)
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
         try:
             person_id = input("Intended Person ID: ")
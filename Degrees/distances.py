@@ -0,0 +1,222 @@
+import argparse
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from graph import load_graph
+
+# Names and typecodes of the CoStarGraph arrays shared with workers
+SHARED_ARRAYS = (
+    ("person_offsets", "q"),
+    ("person_movies", "i"),
+    ("movie_offsets", "q"),
+    ("movie_stars", "i"),
+)
+
+# Arrays attached by each worker process, set by `attach_worker`
+worker_arrays = None
+
+
+def single_source(graph, person_id):
+    """
+    Breadth-first search from one person to everyone reachable.
+
+    Returns (distances, parents, parent_movies) arrays indexed by person
+    index: the degrees of separation from the source (-1 if unreachable),
+    the person each person was reached from, and the movie they share
+    (both -1 for the source and for unreachable people).
+    """
+    return bfs(
+        graph.person_offsets, graph.person_movies,
+        graph.movie_offsets, graph.movie_stars,
+        graph.person_index[person_id]
+    )
+
+
+def bfs(person_offsets, person_movies, movie_offsets, movie_stars, source):
+    """
+    Level-synchronous breadth-first search over CSR arrays from the
+    person index `source`. See `single_source` for the return value.
+    """
+    num_people = len(person_offsets) - 1
+    distances = array("i", [-1]) * num_people
+    parents = array("i", [-1]) * num_people
+    parent_movies = array("i", [-1]) * num_people
+
+    # A movie only needs expanding once, as that reaches all its stars
+    expanded = bytearray(len(movie_offsets) - 1)
+
+    distances[source] = 0
+    layer = [source]
+    depth = 0
+    while layer:
+        depth += 1
+        next_layer = []
+        for person in layer:
+            start, end = person_offsets[person], person_offsets[person + 1]
+            for movie in person_movies[start:end]:
+                if expanded[movie]:
+                    continue
+                expanded[movie] = 1
+                first, last = movie_offsets[movie], movie_offsets[movie + 1]
+                for neighbor in movie_stars[first:last]:
+                    if distances[neighbor] == -1:
+                        distances[neighbor] = depth
+                        parents[neighbor] = person
+                        parent_movies[neighbor] = movie
+                        next_layer.append(neighbor)
+        layer = next_layer
+
+    return distances, parents, parent_movies
+
+
+def summarize(distances, targets=()):
+    """
+    Returns the distance histogram (people at each degree, starting with
+    the source itself at 0), the eccentricity (largest finite distance),
+    the number of people reached and the distance to each target index.
+    """
+    histogram = []
+    for distance in distances:
+        if distance < 0:
+            continue
+        while len(histogram) <= distance:
+            histogram.append(0)
+        histogram[distance] += 1
+
+    return {
+        "histogram": histogram,
+        "eccentricity": len(histogram) - 1,
+        "reached": sum(histogram),
+        "targets": [distances[target] for target in targets]
+    }
+
+
+class SharedGraph():
+    """
+    Copy of the CSR arrays of a CoStarGraph in one shared memory block,
+    so worker processes can search the graph without pickling it.
+    """
+
+    def __init__(self, graph):
+        self.layout = []
+        size = 0
+        for name, typecode in SHARED_ARRAYS:
+            values = getattr(graph, name)
+            self.layout.append((name, typecode, size, len(values)))
+            size += len(values) * values.itemsize
+
+        self.memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, typecode, offset, length in self.layout:
+            data = getattr(graph, name).tobytes()
+            self.memory.buf[offset:offset + len(data)] = data
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+def attach_worker(memory_name, layout):
+    """
+    Pool initializer: attach to the shared graph and view its arrays.
+    """
+    global worker_arrays
+    memory = shared_memory.SharedMemory(name=memory_name)
+    worker_arrays = [memory]
+    for name, typecode, offset, length in layout:
+        size = length * array(typecode).itemsize
+        view = memory.buf[offset:offset + size].cast(typecode)
+        worker_arrays.append(view)
+
+
+def search_worker(source, targets, keep_distances):
+    """
+    Run `bfs` from `source` in a worker and summarize the result.
+    """
+    person_offsets, person_movies, movie_offsets, movie_stars = worker_arrays[1:]
+    distances, parents, parent_movies = bfs(
+        person_offsets, person_movies, movie_offsets, movie_stars, source
+    )
+    summary = summarize(distances, targets)
+    if keep_distances:
+        summary["distances"] = distances
+        summary["parents"] = parents
+        summary["parent_movies"] = parent_movies
+    return summary
+
+
+def multi_source(graph, person_ids, workers=None, keep_distances=False):
+    """
+    Run single-source searches from many people across a process pool
+    that shares the graph arrays through shared memory.
+
+    Returns a dict mapping each source person id to its summary (see
+    `summarize`), where "targets" maps every other source to its
+    distance, giving all-pairs distances among the sources. With
+    `keep_distances`, the summaries also hold the arrays returned by
+    `single_source`.
+    """
+    sources = [graph.person_index[person_id] for person_id in person_ids]
+
+    shared = SharedGraph(graph)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=attach_worker,
+            initargs=(shared.memory.name, shared.layout)
+        ) as executor:
+            futures = [
+                executor.submit(search_worker, source, sources, keep_distances)
+                for source in sources
+            ]
+            results = {}
+            for person_id, future in zip(person_ids, futures):
+                summary = future.result()
+                summary["targets"] = dict(zip(person_ids, summary["targets"]))
+                results[person_id] = summary
+    finally:
+        shared.close()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Degrees of separation from many people to everyone."
+    )
+    parser.add_argument("directory")
+    parser.add_argument("names", nargs="+", help="names or IMDb person ids")
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    print("Loading data...")
+    graph = load_graph(args.directory, cache=args.cache)
+    print("Data loaded.")
+
+    person_ids = []
+    for name in args.names:
+        if name in graph.person_index:
+            person_ids.append(name)
+            continue
+        candidates = graph.person_ids_for_name(name)
+        if len(candidates) != 1:
+            sys.exit(f"Cannot resolve '{name}' to exactly one person.")
+        person_ids.append(candidates[0])
+
+    results = multi_source(graph, person_ids, workers=args.workers)
+    for person_id, summary in results.items():
+        print(f"{graph.person_name(person_id)} ({person_id}):")
+        print(f"  Reached: {summary['reached']} of {len(graph.person_ids)}")
+        print(f"  Eccentricity: {summary['eccentricity']}")
+        for distance, count in enumerate(summary["histogram"]):
+            print(f"  {distance} degrees: {count}")
+        for other, distance in summary["targets"].items():
+            if other != person_id:
+                print(f"  To {graph.person_name(other)}: {distance}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+import csv
+import itertools
+import os
+import pickle
+from array import array
+
+# Bump whenever the layout of CoStarGraph changes, so that stale
+# snapshots are rebuilt rather than loaded
+SNAPSHOT_VERSION = 2
+SNAPSHOT_NAME = ".degrees-snapshot.pickle"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Rows read from a CSV file at a time
+CHUNK_ROWS = 1 << 16
+
+
+class CoStarGraph():
+    """
+    Compact co-star graph.
+
+    People and movies are interned to dense integer indices, and the
+    person -> movies and movie -> stars relations are stored as
+    compressed sparse row (CSR) arrays: the movies of person `p` are
+    `person_movies[person_offsets[p]:person_offsets[p + 1]]`, and
+    likewise for the stars of a movie.
+
+    Names, births, titles and years are not needed to search, so they
+    live in a separate DisplayTable read from the CSV files on first use.
+    """
+
+    def __init__(self, directory=None):
+
+        # Index <-> IMDb id for people and movies
+        self.person_ids = []
+        self.person_index = {}
+        self.movie_ids = []
+        self.movie_index = {}
+
+        # CSR adjacency in both directions
+        self.person_offsets = array("q", [0])
+        self.person_movies = array("i")
+        self.movie_offsets = array("q", [0])
+        self.movie_stars = array("i")
+
+        # Where to read the display table from, and the table once read
+        self.directory = None if directory is None else os.path.abspath(directory)
+        self.table = None
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Load a graph from the people.csv, movies.csv and stars.csv files
+        in `directory`, as `degrees.load_data` does.
+
+        Only the id columns are read, a chunk of rows at a time, so peak
+        memory is the id maps plus a few ints per credit.
+        """
+        graph = cls(directory)
+
+        # Load people
+        for (person_ids,) in read_columns(f"{directory}/people.csv", ["id"]):
+            for person_id in person_ids:
+                graph.intern_person(person_id)
+
+        # Load movies
+        for (movie_ids,) in read_columns(f"{directory}/movies.csv", ["id"]):
+            for movie_id in movie_ids:
+                graph.intern_movie(movie_id)
+
+        # Load stars, skipping credits for unknown people or movies
+        credit_people = array("i")
+        credit_movies = array("i")
+        path = f"{directory}/stars.csv"
+        for person_ids, movie_ids in read_columns(path, ["person_id", "movie_id"]):
+            people = list(map(graph.person_index.get, person_ids))
+            movies = list(map(graph.movie_index.get, movie_ids))
+            if None in people or None in movies:
+                known = [
+                    (person, movie) for person, movie in zip(people, movies)
+                    if person is not None and movie is not None
+                ]
+                people = [person for person, _ in known]
+                movies = [movie for _, movie in known]
+            credit_people.extend(people)
+            credit_movies.extend(movies)
+
+        graph.build_adjacency(credit_people, credit_movies)
+        return graph
+
+    def intern_person(self, person_id):
+        """
+        Returns the index for `person_id`, assigning the next free one
+        if the person has not been seen before.
+        """
+        index = self.person_index.get(person_id)
+        if index is None:
+            index = len(self.person_ids)
+            self.person_index[person_id] = index
+            self.person_ids.append(person_id)
+        return index
+
+    def intern_movie(self, movie_id):
+        """
+        Returns the index for `movie_id`, assigning the next free one
+        if the movie has not been seen before.
+        """
+        index = self.movie_index.get(movie_id)
+        if index is None:
+            index = len(self.movie_ids)
+            self.movie_index[movie_id] = index
+            self.movie_ids.append(movie_id)
+        return index
+
+    def build_adjacency(self, credit_people, credit_movies):
+        """
+        Build both CSR relations from parallel arrays of credits, where
+        `credit_people[i]` starred in `credit_movies[i]`.
+        """
+        self.person_offsets, self.person_movies = csr(
+            credit_people, credit_movies, len(self.person_ids)
+        )
+        self.movie_offsets, self.movie_stars = csr(
+            credit_movies, credit_people, len(self.movie_ids)
+        )
+
+    def display(self):
+        """
+        Returns the DisplayTable, reading it from the CSV files the
+        first time it is needed.
+        """
+        if self.table is None:
+            self.table = DisplayTable.from_csv(self.directory, self)
+        return self.table
+
+    def person_ids_for_name(self, name):
+        """
+        Returns the IMDB ids of every person with the given name.
+        """
+        return [self.person_ids[index]
+                for index in self.display().names.get(name.lower(), [])]
+
+    def person_name(self, person_id):
+        return self.display().person_names[self.person_index[person_id]]
+
+    def person_birth(self, person_id):
+        return self.display().person_births[self.person_index[person_id]]
+
+    def movie_title(self, movie_id):
+        return self.display().movie_titles[self.movie_index[movie_id]]
+
+    def movie_year(self, movie_id):
+        return self.display().movie_years[self.movie_index[movie_id]]
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        person = self.person_index[person_id]
+        neighbors = set()
+        for movie in self.movies_of(person):
+            for star in self.stars_of(movie):
+                neighbors.add((self.movie_ids[movie], self.person_ids[star]))
+        return neighbors
+
+    def movies_of(self, person):
+        """
+        Returns the movie indices of a person index.
+        """
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """
+        Returns the person indices of a movie index.
+        """
+        offsets = self.movie_offsets
+        return self.movie_stars[offsets[movie]:offsets[movie + 1]]
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        If no possible path, returns None.
+        """
+        path = self.shortest_path_indices(
+            self.person_index[source], self.person_index[target]
+        )
+        if path is None:
+            return None
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in path]
+
+    def shortest_path_indices(self, source, target):
+        """
+        Bidirectional breadth-first search between two person indices,
+        walking the CSR arrays directly.
+
+        Returns a list of (movie, person) index pairs, or None if the
+        two people are not connected.
+        """
+        if source == target:
+            return []
+
+        # Per side: the person each reached person was reached from, the
+        # movie they share, and the movies whose stars are already reached
+        forward = ({source: -1}, {}, set())
+        backward = ({target: -1}, {}, set())
+        forward_layer = [source]
+        backward_layer = [target]
+
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        while forward_layer and backward_layer:
+
+            # Expand a whole layer of the smaller side
+            if len(forward_layer) <= len(backward_layer):
+                layer, side, other = forward_layer, forward, backward
+            else:
+                layer, side, other = backward_layer, backward, forward
+            parent, via, expanded_movies = side
+            other_parent = other[0]
+
+            next_layer = []
+            for person in layer:
+                start, end = person_offsets[person], person_offsets[person + 1]
+                for movie in person_movies[start:end]:
+
+                    # Every star of a movie is reached the first time
+                    # the movie is expanded, so never expand it twice
+                    if movie in expanded_movies:
+                        continue
+                    expanded_movies.add(movie)
+
+                    first, last = movie_offsets[movie], movie_offsets[movie + 1]
+                    for neighbor in movie_stars[first:last]:
+                        if neighbor in parent:
+                            continue
+                        parent[neighbor] = person
+                        via[neighbor] = movie
+                        if neighbor in other_parent:
+                            return self.join_paths(forward, backward, neighbor)
+                        next_layer.append(neighbor)
+
+            if side is forward:
+                forward_layer = next_layer
+            else:
+                backward_layer = next_layer
+
+        return None
+
+    @staticmethod
+    def join_paths(forward, backward, meeting):
+        """
+        Returns the (movie, person) index path through `meeting`, given
+        the parent and movie maps of the forward and backward searches.
+        """
+        path = []
+        parent, via = forward[0], forward[1]
+        person = meeting
+        while parent[person] != -1:
+            path.append((via[person], person))
+            person = parent[person]
+        path.reverse()
+
+        parent, via = backward[0], backward[1]
+        person = meeting
+        while parent[person] != -1:
+            path.append((via[person], parent[person]))
+            person = parent[person]
+        return path
+
+
+class DisplayTable():
+    """
+    Display strings for the people and movies of a CoStarGraph, indexed
+    like the graph, plus a map from lowercased names to person indices.
+    """
+
+    def __init__(self, num_people, num_movies):
+        self.person_names = [None] * num_people
+        self.person_births = [None] * num_people
+        self.movie_titles = [None] * num_movies
+        self.movie_years = [None] * num_movies
+        self.names = {}
+
+    @classmethod
+    def from_csv(cls, directory, graph):
+        """
+        Read the display columns of people.csv and movies.csv in
+        `directory` for the people and movies of `graph`.
+        """
+        table = cls(len(graph.person_ids), len(graph.movie_ids))
+
+        path = f"{directory}/people.csv"
+        for person_ids, names, births in read_columns(path, ["id", "name", "birth"]):
+            for person_id, name, birth in zip(person_ids, names, births):
+                index = graph.person_index[person_id]
+                table.person_names[index] = name
+                table.person_births[index] = birth
+                table.names.setdefault(name.lower(), []).append(index)
+
+        path = f"{directory}/movies.csv"
+        for movie_ids, titles, years in read_columns(path, ["id", "title", "year"]):
+            for movie_id, title, year in zip(movie_ids, titles, years):
+                index = graph.movie_index[movie_id]
+                table.movie_titles[index] = title
+                table.movie_years[index] = year
+
+        return table
+
+
+def read_columns(path, columns, chunk_rows=CHUNK_ROWS):
+    """
+    Read only the named `columns` of a CSV file, yielding one list of
+    values per column for every chunk of up to `chunk_rows` rows.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(column) for column in columns]
+        while True:
+            rows = list(itertools.islice(reader, chunk_rows))
+            if not rows:
+                return
+            yield [[row[position] for row in rows] for position in positions]
+
+
+def csr(rows, columns, num_rows):
+    """
+    Group `columns` by `rows` with a counting sort.
+
+    Returns (offsets, values) such that the columns paired with row `r`
+    are `values[offsets[r]:offsets[r + 1]]`.
+    """
+    offsets = array("q", bytes(8 * (num_rows + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for row in range(num_rows):
+        offsets[row + 1] += offsets[row]
+
+    values = array("i", bytes(4 * len(columns)))
+    cursor = offsets[:-1]
+    for row, column in zip(rows, columns):
+        values[cursor[row]] = column
+        cursor[row] += 1
+    return offsets, values
+
+
+def load_graph(directory, cache=False):
+    """
+    Load the co-star graph for `directory`.
+
+    With `cache`, reuse the snapshot saved next to the CSV files when it
+    is still current, and (re)write it otherwise.
+    """
+    if not cache:
+        return CoStarGraph.from_csv(directory)
+
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    signature = source_signature(directory)
+    graph = read_snapshot(path, signature)
+    if graph is None:
+        graph = CoStarGraph.from_csv(directory)
+
+        # Store display strings too, so that cached startups never
+        # need to read the CSV files
+        graph.display()
+        write_snapshot(path, signature, graph)
+    return graph
+
+
+def source_signature(directory):
+    """
+    Returns the size and modification time of every source CSV file,
+    which together identify the data a snapshot was built from.
+    """
+    signature = []
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        signature.append((filename, stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def read_snapshot(path, signature):
+    """
+    Returns the graph stored at `path`, or None if there is no snapshot
+    or it was written by another version or from other source files.
+    """
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+            ValueError):
+        return None
+
+    if (not isinstance(snapshot, dict) or
+            snapshot.get("version") != SNAPSHOT_VERSION or
+            snapshot.get("signature") != signature):
+        return None
+    return snapshot["graph"]
+
+
+def write_snapshot(path, signature, graph):
+    """
+    Save `graph` to `path`, replacing any previous snapshot atomically.
+    """
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "signature": signature,
+        "graph": graph
+    }
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
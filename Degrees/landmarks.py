@@ -0,0 +1,156 @@
+import os
+import pickle
+from array import array
+from collections import deque
+
+from graph import source_signature
+
+# Bump whenever the saved layout of LandmarkIndex changes
+INDEX_VERSION = 2
+
+# Stored distance meaning "not reachable from this landmark"
+UNREACHABLE = 255
+
+# Largest stored distance, meaning "at least this far" from the landmark
+CAPPED = UNREACHABLE - 1
+
+
+class LandmarkIndex():
+    """
+    Precomputed breadth-first distances from a few landmark people to
+    everyone else, stored as one byte per person per landmark.
+
+    By the triangle inequality, the distances to the landmarks bound the
+    degrees of separation between any two people without a search.
+    """
+
+    def __init__(self, person_ids, landmarks, distances, signature=None):
+        self.person_ids = person_ids
+        self.person_index = {
+            person_id: index for index, person_id in enumerate(person_ids)
+        }
+        self.landmarks = landmarks
+        self.distances = distances
+
+        # The `source_signature` of the data the index was built from
+        self.signature = signature
+
+    @classmethod
+    def build(cls, people, neighbors_for_person, k=16, signature=None):
+        """
+        Build an index over the `people` dictionary of degrees.py, using
+        the `k` people who starred in the most movies as landmarks.
+        `signature` identifies the data `people` was loaded from.
+        """
+        person_ids = list(people)
+        index = {person_id: i for i, person_id in enumerate(person_ids)}
+        landmarks = sorted(
+            person_ids, key=lambda person_id: len(people[person_id]["movies"]),
+            reverse=True
+        )[:k]
+
+        distances = []
+        for landmark in landmarks:
+            row = array("B", [UNREACHABLE]) * len(person_ids)
+            row[index[landmark]] = 0
+            queue = deque([landmark])
+            while queue:
+                person_id = queue.popleft()
+                distance = row[index[person_id]] + 1
+                for _, neighbor in neighbors_for_person(person_id):
+                    if row[index[neighbor]] == UNREACHABLE:
+                        row[index[neighbor]] = min(distance, CAPPED)
+                        queue.append(neighbor)
+            distances.append(row)
+
+        return cls(person_ids, landmarks, distances, signature)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index written by `save`.
+        """
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"{path} is not a version {INDEX_VERSION} index")
+        return cls(data["person_ids"], data["landmarks"], data["distances"],
+                   data["signature"])
+
+    def save(self, path):
+        """
+        Write the index to `path`, replacing any previous one atomically.
+        """
+        data = {
+            "version": INDEX_VERSION,
+            "signature": self.signature,
+            "person_ids": self.person_ids,
+            "landmarks": self.landmarks,
+            "distances": self.distances
+        }
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        two person ids. Unknown bounds are 0 and None respectively, and
+        lower is None when a landmark proves the two are not connected.
+        """
+        if source == target:
+            return 0, 0
+        a = self.person_index.get(source)
+        b = self.person_index.get(target)
+        if a is None or b is None:
+            return 0, None
+
+        lower = 0
+        upper = None
+        for row in self.distances:
+            da, db = row[a], row[b]
+            if da == UNREACHABLE and db == UNREACHABLE:
+                continue
+            if da == UNREACHABLE or db == UNREACHABLE:
+                return None, None
+            lower = max(lower, abs(da - db))
+
+            # A capped distance may be shorter than the real one, which
+            # still gives a lower bound but not an upper one
+            if da == CAPPED or db == CAPPED:
+                continue
+            if upper is None or da + db < upper:
+                upper = da + db
+        return lower, upper
+
+    def lower_bound(self, source, target):
+        """
+        Returns a lower bound on the degrees of separation between two
+        person ids, suitable as an admissible A* heuristic.
+        """
+        lower, _ = self.bounds(source, target)
+        return 0 if lower is None else lower
+
+
+def load_index(path, directory, people, neighbors_for_person):
+    """
+    Load the landmark index at `path` if it was built from the CSV files
+    in `directory` as they are now, and otherwise build it from `people`
+    and save it there.
+
+    An index built from other data could overestimate distances, making
+    A* return paths that are not shortest, so it is never reused.
+    """
+    signature = source_signature(directory)
+    try:
+        index = LandmarkIndex.load(path)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+            KeyError, ValueError):
+        index = None
+
+    if index is None or index.signature != signature:
+        index = LandmarkIndex.build(people, neighbors_for_person,
+                                    signature=signature)
+        index.save(path)
+    return index
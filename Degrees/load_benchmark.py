@@ -0,0 +1,108 @@
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+LOADERS = ("dict", "csr")
+
+
+def generate(directory, rows, stars_per_movie=4, seed=0):
+    """
+    Write people.csv, movies.csv and a stars.csv of `rows` credits to
+    `directory`, shaped like the IMDb data used by degrees.py.
+    """
+    rng = random.Random(seed)
+    num_movies = max(1, rows // stars_per_movie)
+    num_people = max(stars_per_movie, rows // 6)
+
+    with open(os.path.join(directory, "people.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(num_people):
+            writer.writerow([i, f"Person {i}", 1900 + i % 100])
+
+    with open(os.path.join(directory, "movies.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(num_movies):
+            writer.writerow([i, f"Movie {i}", 1920 + i % 100])
+
+    with open(os.path.join(directory, "stars.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for i in range(rows):
+            person = int(num_people * rng.random() ** 2)
+            writer.writerow([person, i // stars_per_movie])
+
+
+def measure(loader, directory):
+    """
+    Load `directory` with `loader` in this process and print the elapsed
+    time and peak resident memory as JSON.
+    """
+    start = time.perf_counter()
+    if loader == "dict":
+        import degrees
+        degrees.load_data(directory)
+    else:
+        from graph import CoStarGraph
+        CoStarGraph.from_csv(directory)
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps({"seconds": elapsed, "peak_rss": peak}))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare Degrees loaders on a generated dataset."
+    )
+    parser.add_argument("--rows", type=int, default=10_000_000,
+                        help="number of rows in the generated stars.csv")
+    parser.add_argument("--directory",
+                        help="reuse or keep the generated dataset here")
+    parser.add_argument("--loaders", nargs="+", choices=LOADERS,
+                        default=list(LOADERS))
+    parser.add_argument("--measure", choices=LOADERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Each loader runs in a fresh process so peak memory is its own
+    if args.measure:
+        measure(args.measure, args.directory)
+        return
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.directory or scratch
+        if not os.path.exists(os.path.join(directory, "stars.csv")):
+            os.makedirs(directory, exist_ok=True)
+            print(f"Generating {args.rows} credits...")
+            generate(directory, args.rows)
+
+        with open(os.path.join(directory, "stars.csv"), encoding="utf-8") as f:
+            rows = sum(1 for _ in f) - 1
+
+        for loader in args.loaders:
+            output = subprocess.run(
+                [sys.executable, __file__, "--measure", loader,
+                 "--directory", directory],
+                check=True, capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout
+            result = json.loads(output.splitlines()[-1])
+            print(f"{loader}: {result['seconds']:.2f}s, "
+                  f"{rows / result['seconds']:.0f} rows/s, "
+                  f"peak RSS {result['peak_rss'] / 2 ** 20:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
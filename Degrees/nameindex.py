@@ -0,0 +1,336 @@
+import bisect
+import heapq
+import itertools
+from collections import Counter, namedtuple
+
+# A person matching a query, with the edit distance of their name
+Candidate = namedtuple("Candidate", ["person_id", "name", "fame", "distance"])
+
+# Prefixes at most this long match so many names that their completions
+# are remembered after the first request
+CACHED_PREFIX_LENGTH = 3
+
+# Queries at most this long share too few trigrams with their matches to
+# filter by, so are looked up among names with up to `DELETE_DISTANCE`
+# characters deleted instead
+SHORT_KEY_LENGTH = 6
+DELETE_DISTANCE = 2
+
+
+class NameIndex():
+    """
+    In-memory index of people's names supporting exact, prefix and
+    bounded edit-distance lookup, ranking people by fame (the number of
+    movies they starred in).
+
+    Names are kept lowercased in a sorted list, so a prefix is a
+    contiguous range found by bisection. Fuzzy lookup uses an inverted
+    index of character trigrams, or for short names an index of the
+    names left by deleting characters, both built on first use or by
+    `prepare`.
+    """
+
+    def __init__(self, entries):
+        """
+        Build an index from (name, person_id, fame) entries.
+        """
+        people = {}
+        display = {}
+        for name, person_id, fame in entries:
+            key = name.lower()
+            people.setdefault(key, []).append((fame, person_id))
+            display.setdefault(key, name)
+
+        self.keys = sorted(people)
+        self.names = [display[key] for key in self.keys]
+        self.people = [
+            sorted(people[key], key=lambda entry: -entry[0])
+            for key in self.keys
+        ]
+        self.completions = {}
+        self.trigrams = None
+        self.deletions = None
+
+        # Positions of the names of each length
+        self.lengths = {}
+        for position, key in enumerate(self.keys):
+            self.lengths.setdefault(len(key), []).append(position)
+
+    @classmethod
+    def from_people(cls, people):
+        """
+        Build an index over the `people` dictionary of degrees.py.
+        """
+        return cls(
+            (person["name"], person_id, len(person["movies"]))
+            for person_id, person in people.items()
+        )
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Build an index over the people of a CoStarGraph.
+        """
+        offsets = graph.person_offsets
+        return cls(
+            (graph.person_name(person_id), person_id,
+             offsets[index + 1] - offsets[index])
+            for index, person_id in enumerate(graph.person_ids)
+        )
+
+    def candidates(self, position, distance=0):
+        """
+        Returns a Candidate for every person with the name at `position`.
+        """
+        name = self.names[position]
+        return [Candidate(person_id, name, fame, distance)
+                for fame, person_id in self.people[position]]
+
+    def ranked(self, position, distance):
+        """
+        Generates a (distance, -fame, position, person_id) tuple for every
+        person with the name at `position`, most famous first.
+        """
+        for fame, person_id in self.people[position]:
+            yield distance, -fame, position, person_id
+
+    def exact(self, name):
+        """
+        Returns everyone with exactly this name, most famous first.
+        """
+        key = name.lower()
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return self.candidates(position)
+        return []
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns up to `limit` people whose names start with `prefix`,
+        most famous first.
+        """
+        prefix = prefix.lower()
+        cached = len(prefix) <= CACHED_PREFIX_LENGTH
+        if cached and (prefix, limit) in self.completions:
+            return self.completions[prefix, limit]
+
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + "\U0010ffff", start)
+        matches = heapq.nlargest(
+            limit,
+            (
+                (fame, -position, person_id)
+                for position in range(start, end)
+                for fame, person_id in self.people[position][:limit]
+            )
+        )
+
+        # Positions were negated so that equally famous names sort A to Z
+        result = [
+            Candidate(person_id, self.names[-negated], fame, 0)
+            for fame, negated, person_id in matches
+        ]
+
+        if cached:
+            self.completions[prefix, limit] = result
+        return result
+
+    def search(self, name, max_distance=2, limit=10):
+        """
+        Returns up to `limit` people whose names are within
+        `max_distance` edits of `name`, closest and then most famous first.
+        """
+        key = name.lower()
+
+        # Each edit changes at most three trigrams, so a match shares at
+        # least this many distinct trigrams with the query
+        grams = set(trigrams(key))
+        required = len(grams) - 3 * max_distance
+
+        if required > 0:
+            if self.trigrams is None:
+                self.build_trigrams()
+
+            # A match misses at most `3 * max_distance` trigrams, so it
+            # appears in at least `used - 3 * max_distance` of any `used`
+            # postings. Count the rarest ones, adding a more common
+            # posting only while it costs no more than those before it
+            postings = sorted(
+                (self.trigrams.get(gram, ()) for gram in grams), key=len
+            )
+            used = 3 * max_distance + 1
+            counted = sum(len(posting) for posting in postings[:used])
+            while used < len(postings) and len(postings[used]) <= counted:
+                counted += len(postings[used])
+                used += 1
+
+            counts = Counter()
+            for posting in postings[:used]:
+                counts.update(posting)
+            positions = [
+                position for position, count in counts.items()
+                if count >= used - 3 * max_distance
+            ]
+        elif len(key) <= SHORT_KEY_LENGTH and max_distance <= DELETE_DISTANCE:
+            # Names within `max_distance` edits of each other become the
+            # same string after at most `max_distance` deletions from each
+            if self.deletions is None:
+                self.build_deletions()
+            positions = set()
+            for variant in deletions(key, max_distance):
+                positions.update(self.deletions.get(variant, ()))
+        else:
+            positions = [
+                position
+                for length in range(len(key) - max_distance,
+                                    len(key) + max_distance + 1)
+                for position in self.lengths.get(length, ())
+            ]
+
+        masks = character_masks(key)
+        matches = []
+        for position in positions:
+            candidate = self.keys[position]
+            if abs(len(candidate) - len(key)) > max_distance:
+                continue
+            if (required > 0 and
+                    len(grams.intersection(trigrams(candidate))) < required):
+                continue
+            distance = edit_distance(key, masks, candidate)
+            if distance <= max_distance:
+                matches.append(self.ranked(position, distance))
+
+        # Each name's people are already most famous first, so they are
+        # merged lazily up to `limit`; equally close and famous people
+        # are ordered by name
+        return [
+            Candidate(person_id, self.names[position], -negated, distance)
+            for distance, negated, position, person_id
+            in itertools.islice(heapq.merge(*matches), limit)
+        ]
+
+    def disambiguate(self, name, max_distance=2, limit=10):
+        """
+        Returns the people a name most likely refers to, without
+        prompting: exact matches first, then close misspellings, each
+        ranked by fame. The first candidate, if any, is the best guess.
+        """
+        matches = self.exact(name)
+        if len(matches) >= limit:
+            return matches[:limit]
+        seen = {match.person_id for match in matches}
+        for match in self.search(name, max_distance, limit):
+            if match.person_id not in seen:
+                matches.append(match)
+        return matches[:limit]
+
+    def prepare(self, limit=10):
+        """
+        Build the fuzzy lookup indexes and remember the completions of
+        every short prefix now, so that no request pays for them.
+        """
+        if self.trigrams is None:
+            self.build_trigrams()
+        if self.deletions is None:
+            self.build_deletions()
+        prefixes = {
+            key[:length] for key in self.keys
+            for length in range(1, CACHED_PREFIX_LENGTH + 1)
+        }
+        for prefix in prefixes:
+            self.complete(prefix, limit)
+
+    def build_trigrams(self):
+        """
+        Build the inverted index from trigrams to name positions.
+        """
+        # Publish the index only once complete, as server threads may
+        # search while it is being built
+        index = {}
+        for position, key in enumerate(self.keys):
+            for gram in set(trigrams(key)):
+                index.setdefault(gram, []).append(position)
+        self.trigrams = index
+
+    def build_deletions(self):
+        """
+        Build the index from every string left by deleting at most
+        `DELETE_DISTANCE` characters of a name short enough to match a
+        short query, to the positions of those names.
+        """
+        index = {}
+        for length in range(SHORT_KEY_LENGTH + DELETE_DISTANCE + 1):
+            for position in self.lengths.get(length, ()):
+                for variant in deletions(self.keys[position], DELETE_DISTANCE):
+                    index.setdefault(variant, []).append(position)
+        self.deletions = index
+
+
+def deletions(key, distance):
+    """
+    Returns the set of strings left by deleting at most `distance`
+    characters of `key`, including `key` itself.
+    """
+    variants = {key}
+    frontier = {key}
+    for _ in range(distance):
+        frontier = {
+            variant[:i] + variant[i + 1:]
+            for variant in frontier for i in range(len(variant))
+        }
+        variants |= frontier
+    return variants
+
+
+def trigrams(key):
+    """
+    Returns the character trigrams of `key`, padded so that the first
+    and last characters each start and end trigrams of their own.
+    """
+    padded = f"\0\0{key}\0\0"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def character_masks(key):
+    """
+    Returns a dictionary from each character of `key` to a bitmask of
+    the positions where it occurs, for `edit_distance`.
+    """
+    masks = {}
+    for i, character in enumerate(key):
+        masks[character] = masks.get(character, 0) | 1 << i
+    return masks
+
+
+def edit_distance(key, masks, candidate):
+    """
+    Returns the Levenshtein distance between `key` and `candidate`, given
+    the `character_masks` of `key`.
+
+    This is Myers' bit-parallel algorithm: a column of the usual table
+    is kept as bitmasks of where its values go up or down by one from
+    the row above, and updated a whole column at a time, so each
+    character of `candidate` costs a few integer operations rather than
+    a loop over `key`.
+    """
+    if not key:
+        return len(candidate)
+    full = (1 << len(key)) - 1
+    last = 1 << (len(key) - 1)
+    up, down = full, 0
+    distance = len(key)
+    for character in candidate:
+        equal = masks.get(character, 0)
+        vertical = equal | down
+        horizontal = (((equal & up) + up) ^ up) | equal
+        right_up = down | ~(horizontal | up) & full
+        right_down = up & horizontal
+        if right_up & last:
+            distance += 1
+        elif right_down & last:
+            distance -= 1
+        right_up = (right_up << 1 | 1) & full
+        right_down = (right_down << 1) & full
+        up = right_down | ~(vertical | right_up) & full
+        down = right_up & vertical
+    return distance
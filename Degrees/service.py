@@ -0,0 +1,141 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def answer_query(graph, source_name, target_name, index=None):
+    """
+    Returns a JSON-serialisable result for the degrees of separation
+    between two names, without ever prompting.
+
+    Names may also be given as IMDb person ids, which is how callers
+    pick one person when a name is ambiguous. With a NameIndex, the
+    candidates for an ambiguous or unknown name are ranked by fame and
+    include close misspellings.
+    """
+    result = {"source": source_name, "target": target_name}
+
+    person_ids = []
+    for name in (source_name, target_name):
+        candidates = resolve_name(graph, name)
+        if len(candidates) != 1:
+            result["error"] = ("person not found" if not candidates
+                               else "ambiguous name")
+            result["name"] = name
+            if index is not None:
+                candidates = [match.person_id
+                              for match in index.disambiguate(name)]
+            result["candidates"] = [
+                describe_person(graph, person_id) for person_id in candidates
+            ]
+            return result
+        person_ids.append(candidates[0])
+
+    path = graph.shortest_path(*person_ids)
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+        return result
+
+    result["degrees"] = len(path)
+    result["path"] = [
+        {"movie_id": movie_id,
+         "movie": graph.movie_title(movie_id),
+         "person_id": person_id,
+         "person": graph.person_name(person_id)}
+        for movie_id, person_id in path
+    ]
+    return result
+
+
+def describe_person(graph, person_id):
+    """
+    Returns a JSON-serialisable description of a person.
+    """
+    index = graph.person_index[person_id]
+    return {
+        "id": person_id,
+        "name": graph.person_name(person_id),
+        "birth": graph.person_birth(person_id),
+        "movies": graph.person_offsets[index + 1] - graph.person_offsets[index]
+    }
+
+
+def resolve_name(graph, name):
+    """
+    Returns the person ids a query name may refer to.
+    """
+    name = name.strip()
+    if name in graph.person_index:
+        return [name]
+    return graph.person_ids_for_name(name)
+
+
+def run_batch(graph, lines, out, index=None):
+    """
+    Answer one query per line of `lines`, each holding a source and a
+    target name separated by a tab, writing one JSON object per line
+    to `out`. Blank lines and lines starting with # are skipped.
+    """
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip() or line.startswith("#"):
+            continue
+        fields = line.split("\t")
+        if len(fields) != 2:
+            result = {"line": line, "error": "expected two tab-separated names"}
+        else:
+            result = answer_query(graph, fields[0], fields[1], index)
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+
+def serve(graph, host="127.0.0.1", port=8000, index=None):
+    """
+    Serve queries over HTTP until interrupted, keeping `graph` loaded.
+
+    GET /path?source=NAME&target=NAME returns the result of
+    `answer_query` as JSON. With a NameIndex, GET /complete?prefix=TEXT
+    returns the most famous people whose names start with TEXT.
+    """
+    if index is not None:
+        index.prepare()
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/complete" and index is not None:
+                if "prefix" not in query:
+                    self.send_json(400, {"error": "prefix required"})
+                else:
+                    self.send_json(200, [
+                        describe_person(graph, match.person_id)
+                        for match in index.complete(query["prefix"][0])
+                    ])
+            elif url.path != "/path":
+                self.send_json(404, {"error": "not found"})
+            elif "source" not in query or "target" not in query:
+                self.send_json(400, {"error": "source and target required"})
+            else:
+                self.send_json(200, answer_query(
+                    graph, query["source"][0], query["target"][0], index
+                ))
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving on http://{host}:{port}/path?source=...&target=...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,76 @@
+from collections import deque
+
+
+class Node():
+    def __init__(self, state, parent, action):
+        self.state = state
+        self.parent = parent
+        self.action = action
+
+
+class StackFrontier():
+    def __init__(self):
+        self.frontier = []
+
+    def add(self, node):
+        self.frontier.append(node)
+
+    def contains_state(self, state):
+        return any(node.state == state for node in self.frontier)
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[-1]
+            self.frontier = self.frontier[:-1]
+            return node
+
+
+class QueueFrontier(StackFrontier):
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[0]
+            self.frontier = self.frontier[1:]
+            return node
+
+
+class DequeFrontier():
+    """
+    First-in first-out frontier backed by a deque, with a companion set
+    of states so that membership checks take constant time.
+
+    With `mark_visited`, states stay in the set after their node is
+    removed, so `contains_state` also answers "has this state ever been
+    added?" and a separate explored set is unnecessary.
+    """
+
+    def __init__(self, mark_visited=False):
+        self.frontier = deque()
+        self.states = set()
+        self.mark_visited = mark_visited
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states.add(node.state)
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier.popleft()
+            if not self.mark_visited:
+                self.states.discard(node.state)
+            return node
@@ -0,0 +1,210 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from elimination import infer
+from heredity import load_data
+from vectorized import enumerate_probabilities
+
+# Families sent to a worker at a time, so each task outweighs its overhead
+CHUNK_SIZE = 64
+
+# Chunks in flight per worker, keeping workers busy without queueing
+# every family at once
+CHUNKS_PER_WORKER = 4
+
+# Exact inference methods, by name so workers can look them up
+METHODS = {
+    "elimination": infer,
+    "enumeration": enumerate_probabilities,
+}
+
+CSV_FIELDS = ("file", "person", "gene_2", "gene_1", "gene_0",
+              "trait_true", "trait_false", "error")
+
+
+def family_files(source):
+    """
+    Generate the paths of family CSV files: every .csv file in `source`
+    if it is a directory, in name order, or otherwise every path listed
+    in the manifest file `source`, one per line and relative to it.
+    Blank lines and lines starting with # are skipped.
+    """
+    if os.path.isdir(source):
+        names = sorted(
+            entry.name for entry in os.scandir(source)
+            if entry.is_file() and entry.name.endswith(".csv")
+        )
+        for name in names:
+            yield os.path.join(source, name)
+        return
+
+    directory = os.path.dirname(source)
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield os.path.join(directory, line)
+
+
+def chunks(paths, size):
+    """
+    Generate lists of up to `size` paths from `paths`.
+    """
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def infer_chunk(paths, method):
+    """
+    Load and run inference on each family in `paths`, returning a list
+    of (path, probabilities, error) triples. A family that cannot be
+    read or inferred has None probabilities and the error message.
+    """
+    results = []
+    for path in paths:
+        try:
+            people = load_data(path)
+            results.append((path, METHODS[method](people), None))
+        except Exception as e:
+            results.append((path, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def run_chunks(paths, method, workers, chunk_size=CHUNK_SIZE):
+    """
+    Generate the results of `infer_chunk` for every chunk of `paths`,
+    in the order the chunks complete.
+
+    With more than one worker the chunks run in a process pool, so
+    modules are imported once per worker rather than once per family.
+    Only `CHUNKS_PER_WORKER` chunks per worker are submitted at a time,
+    so the paths are read lazily however many families there are.
+    """
+    pending = chunks(paths, chunk_size)
+    if workers == 1:
+        for chunk in pending:
+            yield infer_chunk(chunk, method)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        running = set()
+        for chunk in pending:
+            running.add(executor.submit(infer_chunk, chunk, method))
+            if len(running) >= workers * CHUNKS_PER_WORKER:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def write_jsonl(out, path, probabilities, error):
+    """
+    Write one family's results to `out` as a JSON object on one line.
+    """
+    if error is None:
+        result = {"file": path, "probabilities": probabilities}
+    else:
+        result = {"file": path, "error": error}
+    out.write(json.dumps(result) + "\n")
+
+
+def csv_writer(out):
+    """
+    Return a function writing one family's results to `out` as CSV rows,
+    one per person, after writing the header row.
+    """
+    writer = csv.writer(out)
+    writer.writerow(CSV_FIELDS)
+
+    def write(out, path, probabilities, error):
+        if error is not None:
+            writer.writerow([path, "", "", "", "", "", "", error])
+            return
+        for person, distributions in probabilities.items():
+            gene, trait = distributions["gene"], distributions["trait"]
+            writer.writerow([path, person, gene[2], gene[1], gene[0],
+                             trait[True], trait[False], ""])
+    return write
+
+
+def run_batch(source, out, output_format="jsonl", method="elimination",
+              workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Run inference on every family listed by `family_files(source)`,
+    streaming results to `out` in `output_format` ("jsonl" or "csv") as
+    they complete, so their order may differ from the input's.
+
+    Returns the number of families, the number that failed and the
+    number of people inferred.
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    if output_format == "jsonl":
+        write = write_jsonl
+    elif output_format == "csv":
+        write = csv_writer(out)
+    else:
+        raise ValueError(f"unknown output format {output_format!r}")
+
+    families = failures = people = 0
+    for results in run_chunks(family_files(source), method, workers,
+                              chunk_size):
+        for path, probabilities, error in results:
+            write(out, path, probabilities, error)
+            families += 1
+            if error is None:
+                people += len(probabilities)
+            else:
+                failures += 1
+        out.flush()
+    return families, failures, people
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Infer gene and trait probabilities for many families."
+    )
+    parser.add_argument("source",
+                        help="directory of family CSV files, or a manifest "
+                             "file listing one per line")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--method", choices=sorted(METHODS),
+                        default="elimination")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--output", help="file for results, default stdout")
+    args = parser.parse_args()
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        families, failures, people = run_batch(
+            args.source, out, args.format, args.method, args.workers,
+            args.chunk_size
+        )
+    finally:
+        if args.output:
+            out.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{families} families ({people} people) in {elapsed:.1f}s, "
+          f"{families / max(elapsed, 1e-9):.0f} per second; "
+          f"{failures} failed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import heapq
+import itertools
+import sys
+
+from heredity import PROBS, load_data, print_probabilities
+
+# Possible numbers of copies of the gene, in the order `main` prints them
+GENE_COUNTS = (2, 1, 0)
+
+
+class Factor():
+    """
+    Table of non-negative values over the gene counts of some people.
+
+    `table` maps each tuple of gene counts, one per person in
+    `variables`, to a value.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = variables
+        self.table = table
+
+    def multiply(self, other):
+        """
+        Return the product of this factor and `other`, over the people
+        of both.
+        """
+        variables = self.variables + tuple(
+            variable for variable in other.variables
+            if variable not in self.variables
+        )
+        own = [variables.index(variable) for variable in self.variables]
+        theirs = [variables.index(variable) for variable in other.variables]
+
+        table = {}
+        for values in itertools.product(GENE_COUNTS, repeat=len(variables)):
+            table[values] = (
+                self.table[tuple(values[i] for i in own)] *
+                other.table[tuple(values[i] for i in theirs)]
+            )
+        return Factor(variables, table)
+
+    def sum_out(self, variable):
+        """
+        Return the factor over every person but `variable`, summing over
+        that person's gene counts.
+        """
+        position = self.variables.index(variable)
+        variables = self.variables[:position] + self.variables[position + 1:]
+        table = {}
+        for values, value in self.table.items():
+            key = values[:position] + values[position + 1:]
+            table[key] = table.get(key, 0) + value
+        return Factor(variables, table)
+
+    def marginal(self, variables):
+        """
+        Return the factor over just `variables`, summing over everyone
+        else's gene counts.
+        """
+        result = self
+        for variable in self.variables:
+            if variable not in variables:
+                result = result.sum_out(variable)
+        return result
+
+    def scaled(self):
+        """
+        Return this factor divided by the sum of its values.
+
+        Messages only matter up to a constant, and keeping them summing
+        to 1 stops long pedigrees underflowing to zero.
+        """
+        total = sum(self.table.values())
+        return Factor(self.variables, {
+            values: value / total for values, value in self.table.items()
+        })
+
+
+def transmission(genes):
+    """
+    Return the probability that a parent with `genes` copies of the gene
+    passes one on, as in `inherit_prob`. A missing parent counts as
+    having none.
+    """
+    if genes == 2:
+        return 1 - PROBS["mutation"]
+    elif genes == 1:
+        return 0.5
+    return PROBS["mutation"]
+
+
+def gene_probability(genes, mother_genes, father_genes):
+    """
+    Return the probability of a child having `genes` copies of the gene
+    given the copies of their mother and father.
+    """
+    mother = transmission(mother_genes)
+    father = transmission(father_genes)
+    if genes == 2:
+        return mother * father
+    elif genes == 1:
+        return mother * (1 - father) + (1 - mother) * father
+    return (1 - mother) * (1 - father)
+
+
+def person_factor(people, person):
+    """
+    Return the factor for `person`: the probability of their gene count
+    given their parents', times the probability of their trait if it is
+    known. An unknown trait sums to 1 over its values, so it adds nothing.
+    """
+    mother, father = people[person]["mother"], people[person]["father"]
+    trait = people[person]["trait"]
+    parents = tuple(parent for parent in (mother, father) if parent)
+
+    table = {}
+    for values in itertools.product(GENE_COUNTS, repeat=1 + len(parents)):
+        genes = values[0]
+        if parents:
+            counts = dict(zip(parents, values[1:]))
+            p = gene_probability(genes, counts.get(mother, 0),
+                                 counts.get(father, 0))
+        else:
+            p = PROBS["gene"][genes]
+        if trait is not None:
+            p *= PROBS["trait"][genes][trait]
+        table[values] = p
+    return Factor((person,) + parents, table)
+
+
+def elimination_order(people):
+    """
+    Return an order in which to eliminate people's gene counts, greedily
+    choosing the person whose elimination adds the fewest new links
+    between the people left (min-fill).
+
+    People are linked if they appear in a factor together: a child with
+    each parent, and the two parents of a child with each other. In a
+    pedigree without marriages between relatives this never adds links,
+    so no factor grows beyond a person and their two parents.
+    """
+    links = {person: set() for person in people}
+    for person in people:
+        parents = [parent for parent in (people[person]["mother"],
+                                         people[person]["father"]) if parent]
+        for a, b in itertools.combinations([person] + parents, 2):
+            links[a].add(b)
+            links[b].add(a)
+
+    def fill(person):
+        return sum(
+            1 for a, b in itertools.combinations(links[person], 2)
+            if b not in links[a]
+        )
+
+    # Fills only change near an elimination, so keep them in a heap and
+    # skip entries that have since gone stale
+    fills = {person: fill(person) for person in people}
+    heap = [(value, person) for person, value in fills.items()]
+    heapq.heapify(heap)
+
+    order = []
+    while heap:
+        value, person = heapq.heappop(heap)
+        if person not in links or fills[person] != value:
+            continue
+        neighbours = links.pop(person)
+        for a, b in itertools.combinations(neighbours, 2):
+            links[a].add(b)
+            links[b].add(a)
+        for neighbour in neighbours:
+            links[neighbour].discard(person)
+        order.append(person)
+
+        changed = set(neighbours)
+        for neighbour in neighbours:
+            changed |= links[neighbour]
+        for other in changed:
+            fills[other] = fill(other)
+            heapq.heappush(heap, (fills[other], other))
+    return order
+
+
+def clique_tree(factors, order):
+    """
+    Eliminate people in `order` from the product of `factors`, returning
+    the cliques formed along the way as a list of dictionaries.
+
+    Eliminating a person multiplies every factor that mentions them into
+    one clique. Each clique keeps the person, the product of the original
+    factors first used there as its `potential`, the message it sends
+    its `parent` (the later clique that uses it, or None) and the
+    cliques it receives messages from as its `children`.
+    """
+    position = {variable: i for i, variable in enumerate(order)}
+
+    # Each factor waits in the bucket of the first of its people to be
+    # eliminated, as does each message
+    buckets = {variable: [] for variable in order}
+    for factor in factors:
+        first = min(factor.variables, key=position.get)
+        buckets[first].append((factor, None))
+
+    cliques = []
+    for variable in order:
+        potential = Factor((), {(): 1.0})
+        children = []
+        for factor, child in buckets.pop(variable):
+            if child is None:
+                potential = potential.multiply(factor)
+            else:
+                children.append(child)
+
+        product = potential
+        for child in children:
+            product = product.multiply(cliques[child]["message"])
+        number = len(cliques)
+        for child in children:
+            cliques[child]["parent"] = number
+        message = product.sum_out(variable).scaled()
+        cliques.append({
+            "variable": variable,
+            "potential": potential,
+            "message": message,
+            "children": children,
+            "parent": None,
+        })
+        if message.variables:
+            first = min(message.variables, key=position.get)
+            buckets[first].append((message, number))
+    return cliques
+
+
+def calibrate(cliques):
+    """
+    Return the distribution of each person's gene count, passing
+    messages back down `clique_tree` from the last clique to the first.
+
+    The messages up the tree were computed by the elimination itself, so
+    one pass down gives every clique the product of all factors outside
+    its branch, and so every person's distribution, in time linear in
+    the number of cliques.
+    """
+    down = [Factor((), {(): 1.0}) for clique in cliques]
+    distributions = {}
+    for number in reversed(range(len(cliques))):
+        clique = cliques[number]
+        belief = clique["potential"].multiply(down[number])
+        for child in clique["children"]:
+            belief = belief.multiply(cliques[child]["message"])
+
+        marginal = belief.marginal((clique["variable"],))
+        total = sum(marginal.table.values())
+        distributions[clique["variable"]] = {
+            genes: marginal.table[(genes,)] / total for genes in GENE_COUNTS
+        }
+
+        # Each child hears from everything but its own branch
+        for child in clique["children"]:
+            message = clique["potential"].multiply(down[number])
+            for other in clique["children"]:
+                if other != child:
+                    message = message.multiply(cliques[other]["message"])
+            down[child] = message.marginal(
+                cliques[child]["message"].variables
+            ).scaled()
+    return distributions
+
+
+def infer(people):
+    """
+    Return the `probabilities` dictionary computed by `main`, the gene
+    and trait distribution of every person given the known traits, by
+    variable elimination over a clique tree instead of enumerating every
+    assignment.
+
+    For pedigrees without marriages between relatives, no clique holds
+    more than three people, so the time taken grows linearly with the
+    number of people rather than as 6 ** N.
+    """
+    factors = [person_factor(people, person) for person in people]
+    genes = calibrate(clique_tree(factors, elimination_order(people)))
+
+    probabilities = {}
+    for person in people:
+        trait = people[person]["trait"]
+        if trait is None:
+            has_trait = sum(
+                genes[person][count] * PROBS["trait"][count][True]
+                for count in GENE_COUNTS
+            )
+            traits = {True: has_trait, False: 1 - has_trait}
+        else:
+            traits = {True: float(trait), False: float(not trait)}
+        probabilities[person] = {"gene": genes[person], "trait": traits}
+    return probabilities
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python elimination.py data.csv")
+    people = load_data(sys.argv[1])
+    print_probabilities(people, infer(people))
+
+
+if __name__ == "__main__":
+    main()
@@ -60,31 +60,25 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
+    # Loop over every assignment of genes and traits that agrees with
+    # known information
+    for one_gene, two_genes, have_trait in assignments(people):
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+        # Update probabilities with new joint probability
+        p = joint_probability(people, one_gene, two_genes, have_trait)
+        update(probabilities, one_gene, two_genes, have_trait, p)
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
 
     # Print results
+    print_probabilities(people, probabilities)
+
+
+def print_probabilities(people, probabilities):
+    """
+    Print each person's gene and trait probability distributions.
+    """
     for person in people:
         print(f"{person}:")
         for field in probabilities[person]:
@@ -128,6 +122,109 @@ def powerset(s):
     ]
 
 
+def pedigree_order(people):
+    """
+    Return a list of everyone in `people`, with parents before their children.
+    """
+    order = []
+    placed = set()
+    expanded = set()
+
+    # Depth-first with an explicit stack, as pedigrees can be deeper than
+    # the recursion limit: a person is placed once both parents are
+    for person in people:
+        stack = [person]
+        while stack:
+            person = stack[-1]
+            if person in placed:
+                stack.pop()
+                continue
+            waiting = [
+                parent for parent in (people[person]["father"],
+                                      people[person]["mother"])
+                if parent and parent not in placed
+            ]
+            if waiting:
+                if person in expanded:
+                    raise ValueError(f"{person} is their own ancestor")
+                expanded.add(person)
+                stack.extend(waiting)
+                continue
+            stack.pop()
+            placed.add(person)
+            order.append(person)
+    return order
+
+
+def assignments(people):
+    """
+    Generate every (one_gene, two_genes, have_trait) assignment of genes and
+    traits that agrees with the known traits in `people`.
+
+    People are assigned one at a time, parents before children, like the digits
+    of an odometer: known traits are fixed up front, and a gene count with
+    probability 0 given the parents' is skipped along with every assignment
+    that would extend it. The same three sets are updated in place and yielded
+    every time, so no subsets are allocated; use them before asking for the
+    next assignment.
+    """
+    order = pedigree_order(people)
+    if not order:
+        return
+
+    # The (gene_count, trait) pairs each person may take, gene counts together
+    options = [
+        [
+            (gene_count, trait)
+            for gene_count in (0, 1, 2)
+            for trait in ((True, False) if people[person]["trait"] is None
+                          else (people[person]["trait"],))
+            if PROBS["trait"][gene_count][trait] != 0
+        ]
+        for person in order
+    ]
+    one_gene, two_genes, have_trait = set(), set(), set()
+    sets = {1: one_gene, 2: two_genes}
+    choice = [-1] * len(order)
+
+    level = 0
+    while level >= 0:
+        person = order[level]
+        level_options = options[level]
+        index = choice[level]
+        if index >= 0:
+            gene_count, trait = level_options[index]
+            if gene_count:
+                sets[gene_count].discard(person)
+            if trait:
+                have_trait.discard(person)
+
+        # Move on to the next option, skipping gene counts that cannot occur
+        index += 1
+        while index < len(level_options):
+            gene_count = level_options[index][0]
+            if (index > 0 and level_options[index - 1][0] == gene_count or
+                    gene_prob(people, person, gene_count, one_gene, two_genes) != 0):
+                break
+            while index < len(level_options) and level_options[index][0] == gene_count:
+                index += 1
+        if index == len(level_options):
+            choice[level] = -1
+            level -= 1
+            continue
+
+        choice[level] = index
+        gene_count, trait = level_options[index]
+        if gene_count:
+            sets[gene_count].add(person)
+        if trait:
+            have_trait.add(person)
+        if level == len(order) - 1:
+            yield one_gene, two_genes, have_trait
+        else:
+            level += 1
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -146,27 +243,31 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         gene_count = 2 if individual in two_genes else 1 if individual in one_gene else 0
         has_trait = individual in have_trait
 
-        mother, father = people[individual]['mother'], people[individual]['father']
-        individual_prob = 1
-
-        if not mother and not father:
-            individual_prob *= PROBS['gene'][gene_count]
-        else:
-            mother_chance = inherit_prob(mother, one_gene, two_genes)
-            father_chance = inherit_prob(father, one_gene, two_genes)
-
-            if gene_count == 2:
-                individual_prob *= mother_chance * father_chance
-            elif gene_count == 1:
-                individual_prob *= (1 - mother_chance) * father_chance + (1 - father_chance) * mother_chance
-            else:
-                individual_prob *= (1 - mother_chance) * (1 - father_chance)
-
+        individual_prob = gene_prob(people, individual, gene_count, one_gene, two_genes)
         individual_prob *= PROBS['trait'][gene_count][has_trait]
         probability *= individual_prob
     
     return probability
 
+def gene_prob(people, person, gene_count, one_gene, two_genes):
+    """
+    Calculate the probability of `person` having `gene_count` copies of the gene,
+    given the copies their parents have in `one_gene` and `two_genes`.
+    """
+    mother, father = people[person]['mother'], people[person]['father']
+
+    if not mother and not father:
+        return PROBS['gene'][gene_count]
+
+    mother_chance = inherit_prob(mother, one_gene, two_genes)
+    father_chance = inherit_prob(father, one_gene, two_genes)
+
+    if gene_count == 2:
+        return mother_chance * father_chance
+    elif gene_count == 1:
+        return (1 - mother_chance) * father_chance + (1 - father_chance) * mother_chance
+    return (1 - mother_chance) * (1 - father_chance)
+
 def inherit_prob(parent_name, one_gene, two_genes):
     """
     Calculate the probability of a parent passing a mutated gene to their child.
@@ -0,0 +1,337 @@
+import argparse
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from heredity import PROBS, gene_prob, load_data, pedigree_order
+
+# Gibbs sampling is taken to have converged once every R-hat is below this
+R_HAT_THRESHOLD = 1.01
+
+# Columns of the per-person estimates: gene counts 0, 1, 2 and the trait
+TRAIT_COLUMN = 3
+
+
+class Pedigree():
+    """
+    People numbered in `pedigree_order`, with the `PROBS` tables looked
+    up by gene count, so chains can sample without building sets.
+    """
+
+    def __init__(self, people):
+        self.order = pedigree_order(people)
+        number = {person: i for i, person in enumerate(self.order)}
+
+        # A missing parent has no copies, as in `inherit_prob`, so they
+        # point at an extra slot whose gene count stays 0
+        missing = len(self.order)
+        self.parents = [
+            None if not people[person]["mother"] and not people[person]["father"]
+            else (number.get(people[person]["mother"], missing),
+                  number.get(people[person]["father"], missing))
+            for person in self.order
+        ]
+        self.children = [[] for person in self.order]
+        for i, parents in enumerate(self.parents):
+            for parent in set(parents or ()) - {missing}:
+                self.children[parent].append(i)
+
+        # Probability of each gene count for people without parents, and
+        # given the parents' gene counts, from `gene_prob`
+        self.prior = [PROBS["gene"][gene_count] for gene_count in (0, 1, 2)]
+        family = {
+            "mother": {"mother": None, "father": None},
+            "father": {"mother": None, "father": None},
+            "child": {"mother": "mother", "father": "father"},
+        }
+        self.inheritance = [[[0] * 3 for father in range(3)] for mother in range(3)]
+        for mother in range(3):
+            for father in range(3):
+                one_gene, two_genes = set(), set()
+                for parent, gene_count in (("mother", mother), ("father", father)):
+                    if gene_count == 1:
+                        one_gene.add(parent)
+                    elif gene_count == 2:
+                        two_genes.add(parent)
+                for gene_count in range(3):
+                    self.inheritance[mother][father][gene_count] = gene_prob(
+                        family, "child", gene_count, one_gene, two_genes
+                    )
+
+        # Probability of each person's known trait, if any, and of them
+        # having the trait, given their gene count
+        self.evidence = []
+        self.has_trait = []
+        for person in self.order:
+            trait = people[person]["trait"]
+            if trait is None:
+                self.evidence.append([1] * 3)
+                self.has_trait.append([PROBS["trait"][gene_count][True]
+                                       for gene_count in range(3)])
+            else:
+                self.evidence.append([PROBS["trait"][gene_count][trait]
+                                      for gene_count in range(3)])
+                self.has_trait.append([float(trait)] * 3)
+
+    def gene_weights(self, i, genes):
+        """
+        Return the probability of person `i` having each gene count given
+        their parents' in `genes`.
+        """
+        if self.parents[i] is None:
+            return self.prior
+        mother, father = self.parents[i]
+        return self.inheritance[genes[mother]][genes[father]]
+
+    def forward_sample(self, genes, uniforms):
+        """
+        Draw everyone's gene count into `genes` given their parents',
+        parents first, returning the logarithm of the probability of the
+        known traits, which is too small for a float in large pedigrees.
+        """
+        log_weight = 0
+        for i, u in enumerate(uniforms):
+            genes[i] = choose(self.gene_weights(i, genes), u)
+            evidence = self.evidence[i][genes[i]]
+            if evidence == 0:
+                return -math.inf
+            log_weight += math.log(evidence)
+        return log_weight
+
+
+def choose(weights, u):
+    """
+    Return the index chosen from unnormalized `weights` by a uniform
+    random number `u`.
+    """
+    target = u * sum(weights)
+    for index, weight in enumerate(weights):
+        target -= weight
+        if target < 0:
+            return index
+    return len(weights) - 1
+
+
+def gibbs_chain(people, sweeps, burn_in, seed):
+    """
+    Run one Gibbs sampling chain over everyone's gene count, given the
+    known traits, for `burn_in` sweeps and then `sweeps` more.
+
+    Each sweep resamples every person from their distribution given
+    everyone else: their parents' gene counts, their own known trait and
+    their children's gene counts. That distribution is averaged over the
+    kept sweeps, rather than the sampled value, for lower variance.
+
+    Returns the mean and variance over kept sweeps of each person's
+    estimates, as arrays with a row per person in `pedigree_order` and
+    a column per gene count and for the trait.
+    """
+    rng = np.random.default_rng(seed)
+    pedigree = Pedigree(people)
+    size = len(pedigree.order)
+
+    # Start from a draw of the gene counts from their prior
+    genes = [0] * (size + 1)
+    pedigree.forward_sample(genes, rng.random(size).tolist())
+
+    sums = np.zeros((size, 4))
+    squares = np.zeros((size, 4))
+    estimates = [[0.0] * 4 for i in range(size)]
+    for sweep in range(burn_in + sweeps):
+        for i, u in enumerate(rng.random(size).tolist()):
+            weights = []
+            parent_weights = pedigree.gene_weights(i, genes)
+            evidence = pedigree.evidence[i]
+            for gene_count in (0, 1, 2):
+                genes[i] = gene_count
+                weight = parent_weights[gene_count] * evidence[gene_count]
+                for child in pedigree.children[i]:
+                    mother, father = pedigree.parents[child]
+                    weight *= pedigree.inheritance[genes[mother]][genes[father]][genes[child]]
+                weights.append(weight)
+            genes[i] = choose(weights, u)
+
+            if sweep >= burn_in:
+                total = sum(weights)
+                row = estimates[i]
+                row[0], row[1], row[2] = (weight / total for weight in weights)
+                has_trait = pedigree.has_trait[i]
+                row[TRAIT_COLUMN] = (row[0] * has_trait[0] + row[1] * has_trait[1] +
+                                     row[2] * has_trait[2])
+        if sweep >= burn_in:
+            values = np.array(estimates)
+            sums += values
+            squares += values ** 2
+
+    means = sums / sweeps
+    variances = np.maximum(squares / sweeps - means ** 2, 0) * sweeps / max(sweeps - 1, 1)
+    return means, variances
+
+
+def weighting_chain(people, samples, seed):
+    """
+    Draw `samples` assignments of gene counts by likelihood weighting:
+    everyone's gene count is drawn given their parents', parents first,
+    and each assignment is weighted by the probability of the known
+    traits given it.
+
+    Returns the weighted mean of each person's estimates, laid out as in
+    `gibbs_chain`, and the effective number of samples given the spread
+    of the weights.
+    """
+    rng = np.random.default_rng(seed)
+    pedigree = Pedigree(people)
+    size = len(pedigree.order)
+    genes = [0] * (size + 1)
+    rows = np.arange(size)
+    has_trait = np.array(pedigree.has_trait)
+
+    # Weights are kept relative to the largest seen so far
+    log_weights = np.empty(samples)
+    sums = np.zeros((size, 4))
+    scale = -math.inf
+    for sample in range(samples):
+        log_weight = pedigree.forward_sample(genes, rng.random(size).tolist())
+        log_weights[sample] = log_weight
+        if log_weight == -math.inf:
+            continue
+        if log_weight > scale:
+            sums *= math.exp(scale - log_weight)
+            scale = log_weight
+
+        drawn = np.array(genes[:size])
+        estimates = np.zeros((size, 4))
+        estimates[rows, drawn] = 1
+        estimates[:, TRAIT_COLUMN] = has_trait[rows, drawn]
+        sums += math.exp(log_weight - scale) * estimates
+
+    if scale == -math.inf:
+        raise ValueError("no sample agrees with the known traits")
+    weights = np.exp(log_weights - scale)
+    return sums / weights.sum(), weights.sum() ** 2 / (weights ** 2).sum()
+
+
+def r_hat(means, variances, draws):
+    """
+    Return the Gelman-Rubin potential scale reduction of every estimate
+    from the means and variances of each of several chains of `draws`
+    draws: how much wider the spread across chains is than within them.
+    Values near 1 suggest the chains have converged.
+    """
+    within = variances.mean(axis=0)
+    between = draws * means.var(axis=0, ddof=1)
+    pooled = (draws - 1) / draws * within + between / draws
+
+    # Estimates that never vary, like known traits, have nothing to check
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(within > 0, pooled / within, 1)
+    return np.sqrt(ratio)
+
+
+def sample_probabilities(people, method="gibbs", samples=2000, chains=4,
+                         burn_in=None, seed=None, workers=1):
+    """
+    Estimate the `probabilities` dictionary computed by `main` by
+    sampling, with `chains` independent chains of `samples` draws each,
+    seeded from `seed` and run in `workers` processes.
+
+    `method` is "gibbs" for Gibbs sampling, discarding `burn_in` sweeps
+    of each chain first (a fifth of `samples` by default), or "weighting"
+    for likelihood weighting.
+
+    Returns the estimated probabilities; their standard errors, in the
+    same layout, from the spread of the chain estimates; and a dictionary
+    of convergence diagnostics: the largest R-hat and whether it is
+    below `R_HAT_THRESHOLD` for Gibbs sampling, and the effective number
+    of samples for likelihood weighting.
+    """
+    if chains < 2:
+        raise ValueError("at least 2 chains are needed to estimate errors")
+    if burn_in is None:
+        burn_in = samples // 5
+    seeds = np.random.SeedSequence(seed).spawn(chains)
+    if method == "gibbs":
+        chain, tasks = gibbs_chain, [(people, samples, burn_in, s) for s in seeds]
+    elif method == "weighting":
+        chain, tasks = weighting_chain, [(people, samples, s) for s in seeds]
+    else:
+        raise ValueError(f"unknown method {method!r}")
+
+    if workers == 1:
+        results = [chain(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(chain, *zip(*tasks)))
+
+    means = np.array([result[0] for result in results])
+    estimates = means.mean(axis=0)
+    errors = means.std(axis=0, ddof=1) / math.sqrt(chains)
+    if method == "gibbs":
+        largest = float(r_hat(means, np.array([result[1] for result in results]),
+                              samples).max())
+        diagnostics = {"r_hat": largest, "converged": largest < R_HAT_THRESHOLD}
+    else:
+        diagnostics = {
+            "effective_samples": float(sum(result[1] for result in results))
+        }
+
+    # Lay the rows out as `main` does; not having the trait has the same
+    # standard error as having it
+    def layout(row, no_trait):
+        return {
+            "gene": {gene_count: float(row[gene_count])
+                     for gene_count in (2, 1, 0)},
+            "trait": {True: float(row[TRAIT_COLUMN]), False: float(no_trait)},
+        }
+
+    number = {person: i for i, person in enumerate(pedigree_order(people))}
+    probabilities = {}
+    standard_errors = {}
+    for person in people:
+        row, error = estimates[number[person]], errors[number[person]]
+        probabilities[person] = layout(row, 1 - row[TRAIT_COLUMN])
+        standard_errors[person] = layout(error, error[TRAIT_COLUMN])
+    return probabilities, standard_errors, diagnostics
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimate gene and trait probabilities by sampling, "
+                    "for pedigrees too large for exact inference."
+    )
+    parser.add_argument("data", help="CSV file of people, as for heredity.py")
+    parser.add_argument("--method", choices=("gibbs", "weighting"),
+                        default="gibbs")
+    parser.add_argument("--samples", type=int, default=2000,
+                        help="sweeps or samples per chain")
+    parser.add_argument("--chains", type=int, default=4)
+    parser.add_argument("--burn-in", type=int,
+                        help="Gibbs sweeps discarded per chain")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    people = load_data(args.data)
+    probabilities, errors, diagnostics = sample_probabilities(
+        people, args.method, args.samples, args.chains, args.burn_in,
+        args.seed, args.workers
+    )
+
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                error = errors[person][field][value]
+                print(f"    {value}: {p:.4f} ± {error:.4f}")
+    if args.method == "gibbs":
+        status = "converged" if diagnostics["converged"] else "NOT converged"
+        print(f"Largest R-hat: {diagnostics['r_hat']:.4f} ({status})")
+    else:
+        print(f"Effective samples: {diagnostics['effective_samples']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import itertools
+import sys
+
+import numpy as np
+
+from elimination import GENE_COUNTS, gene_probability
+from heredity import PROBS, load_data, print_probabilities
+
+# Assignments whose joint probabilities are computed at once
+BLOCK_ASSIGNMENTS = 1 << 16
+
+
+def probability_tables():
+    """
+    Return the `PROBS` tables as arrays over states, where state
+    2 * genes + trait encodes a person's gene count and trait: the
+    probability of each state for people without parents, and for
+    children given their mother's and father's gene counts.
+    """
+    founder = np.empty(6)
+    child = np.empty((3, 3, 6))
+    for genes in range(3):
+        for trait in (False, True):
+            state = 2 * genes + trait
+            founder[state] = PROBS["gene"][genes] * PROBS["trait"][genes][trait]
+            for mother in range(3):
+                for father in range(3):
+                    child[mother, father, state] = (
+                        gene_probability(genes, mother, father) *
+                        PROBS["trait"][genes][trait]
+                    )
+    return founder, child
+
+
+def enumerate_probabilities(people, block_assignments=BLOCK_ASSIGNMENTS):
+    """
+    Return the `probabilities` dictionary computed by `main`, summing
+    joint probabilities over every assignment of genes and traits that
+    agrees with the known traits, as `main` does.
+
+    Each person takes one of 6 states, or one of 3 if their trait is
+    known. Assignments are enumerated in blocks: every combination of
+    states of the first (inner) people, encoded once as integer arrays,
+    for each combination of states of the rest. The joint probabilities
+    of a block are products of lookups in `probability_tables`, and the
+    marginals are accumulated with `bincount`. Factors involving only
+    inner people are the same in every block, so are multiplied once.
+    """
+    if not people:
+        return {}
+    names = list(people)
+    number = {person: i for i, person in enumerate(names)}
+    founder, child = probability_tables()
+
+    # The states each person may take
+    choices = []
+    for person in names:
+        trait = people[person]["trait"]
+        if trait is None:
+            choices.append(np.arange(6))
+        else:
+            choices.append(2 * np.arange(3) + trait)
+
+    inner = 0
+    size = 1
+    while inner < len(names) and size * len(choices[inner]) <= block_assignments:
+        size *= len(choices[inner])
+        inner += 1
+    states = [
+        choices[i][digits] for i, digits in
+        enumerate(np.indices([len(c) for c in choices[:inner]]).reshape(inner, -1))
+    ]
+
+    # A person's factor, given a list of everyone's states
+    def factor(i, states):
+        mother, father = people[names[i]]["mother"], people[names[i]]["father"]
+        if not mother and not father:
+            return founder[states[i]]
+
+        # A missing parent has no copies, as in `inherit_prob`
+        mother_genes = states[number[mother]] // 2 if mother else 0
+        father_genes = states[number[father]] // 2 if father else 0
+        return child[mother_genes, father_genes, states[i]]
+
+    def is_inner(i):
+        return i < inner and all(
+            number[parent] < inner
+            for parent in (people[names[i]]["mother"], people[names[i]]["father"])
+            if parent
+        )
+
+    base = np.ones(size)
+    for i in range(len(names)):
+        if is_inner(i):
+            base *= factor(i, states)
+    outer = [i for i in range(len(names)) if not is_inner(i)]
+
+    sums = np.zeros((len(names), 6))
+    for combination in itertools.product(*choices[inner:]):
+        block = states + list(combination)
+        p = base
+        for i in outer:
+            p = p * factor(i, block)
+
+        for i in range(inner):
+            sums[i] += np.bincount(states[i], weights=p, minlength=6)
+        total = p.sum()
+        for i, state in enumerate(combination, inner):
+            sums[i, state] += total
+
+    # Gene count and trait distributions from the state sums
+    sums = sums.reshape(len(names), 3, 2)
+    genes_sums = sums.sum(axis=2)
+    genes_sums /= genes_sums.sum(axis=1, keepdims=True)
+    trait_sums = sums.sum(axis=1)
+    trait_sums /= trait_sums.sum(axis=1, keepdims=True)
+    return {
+        person: {
+            "gene": {genes: float(genes_sums[i, genes])
+                     for genes in GENE_COUNTS},
+            "trait": {True: float(trait_sums[i, 1]),
+                      False: float(trait_sums[i, 0])},
+        }
+        for i, person in enumerate(names)
+    }
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python vectorized.py data.csv")
+    people = load_data(sys.argv[1])
+    print_probabilities(people, enumerate_probabilities(people))
+
+
+if __name__ == "__main__":
+    main()
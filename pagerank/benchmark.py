@@ -0,0 +1,225 @@
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from montecarlo import monte_carlo_pagerank
+from pagerank import (DAMPING, SAMPLES, crawl, iterate_pagerank,
+                      iterate_pagerank_sparse, sample_pagerank,
+                      sample_pagerank_fast)
+
+SIZES = (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7)
+
+# Fractions of pages without links, and of links from a page to itself
+DANGLING = 0.1
+SELF_LINKS = 0.01
+
+# Tolerance of the iteration that sampling errors are measured against
+REFERENCE_TOLERANCE = 1e-10
+
+
+def generate(num_pages, seed=0):
+    """
+    Return a random corpus of `num_pages` pages, in the form returned by
+    `crawl`, and the links each page's HTML file would contain.
+
+    Out-degrees and in-degrees both follow power laws, as on the web.
+    A `DANGLING` fraction of pages have no links, and a `SELF_LINKS`
+    fraction of links point back at their own page. Those appear in the
+    HTML but, as `crawl` drops them, not in the corpus.
+    """
+    rng = np.random.default_rng(seed)
+    out_degree = np.minimum(rng.zipf(2.0, num_pages), num_pages)
+    out_degree[rng.random(num_pages) < DANGLING] = 0
+    sources = np.repeat(np.arange(num_pages), out_degree)
+    targets = (num_pages * rng.random(len(sources)) ** 3).astype(np.int64)
+    self_links = rng.random(len(sources)) < SELF_LINKS
+    targets[self_links] = sources[self_links]
+
+    pages = [f"{i}.html" for i in range(num_pages)]
+    offsets = np.concatenate(([0], np.cumsum(out_degree))).tolist()
+    targets = targets.tolist()
+    html_links = {}
+    corpus = {}
+    for i, page in enumerate(pages):
+        links = {pages[target] for target in targets[offsets[i]:offsets[i + 1]]}
+        html_links[page] = links
+        corpus[page] = links - {page}
+    return corpus, html_links
+
+
+def write_html(directory, html_links):
+    """
+    Write one HTML file per page to `directory`, linking to its links.
+    """
+    for page, links in html_links.items():
+        anchors = "".join(f'<li><a href="{link}">{link}</a></li>\n'
+                          for link in sorted(links))
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<body>\n<h1>{page}</h1>\n"
+                    f"<ul>\n{anchors}</ul>\n</body>\n</html>\n")
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident memory of this process, where Linux allows.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """
+    Return the peak resident memory of this process in bytes since the
+    last `reset_peak_rss`, or None where that is not available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def l1_error(ranks, reference):
+    """
+    Return the sum of absolute differences between two rankings.
+    """
+    return sum(abs(ranks[page] - reference[page]) for page in reference)
+
+
+def run_size(num_pages, samples_per_page, crawl_limit, reference_limit,
+             seed):
+    """
+    Benchmark every stage on a generated corpus of `num_pages` pages in
+    this process, generating one JSON-serialisable result per stage.
+    """
+    start = time.perf_counter()
+    corpus, html_links = generate(num_pages, seed)
+    info = {
+        "pages": num_pages,
+        "links": sum(len(links) for links in corpus.values()),
+        "dangling": sum(1 for links in corpus.values() if not links),
+        "self_links": sum(page in links for page, links in html_links.items()),
+    }
+    yield dict(info, stage="generate", seconds=time.perf_counter() - start)
+
+    if num_pages <= crawl_limit:
+        with tempfile.TemporaryDirectory() as directory:
+            write_html(directory, html_links)
+            del html_links
+            reset_peak_rss()
+            start = time.perf_counter()
+            crawled = crawl(directory)
+            seconds = time.perf_counter() - start
+            yield dict(info, stage="crawl", seconds=seconds,
+                       peak_rss=peak_rss(), matches=crawled == corpus)
+            del crawled
+    else:
+        del html_links
+
+    reset_peak_rss()
+    start = time.perf_counter()
+    reference = iterate_pagerank_sparse(corpus, DAMPING, REFERENCE_TOLERANCE)
+    yield dict(info, stage="iterate_sparse", seconds=time.perf_counter() - start,
+               peak_rss=peak_rss(), tolerance=REFERENCE_TOLERANCE)
+
+    samples = max(SAMPLES, samples_per_page * num_pages)
+    stages = [
+        ("sample_fast", lambda: sample_pagerank_fast(
+            corpus, DAMPING, samples, seed=seed)),
+        ("monte_carlo", lambda: monte_carlo_pagerank(
+            corpus, DAMPING, samples, seed=seed)[0]),
+    ]
+    if num_pages <= reference_limit:
+        stages.append(
+            ("sample", lambda: sample_pagerank(corpus, DAMPING, samples))
+        )
+    for stage, sampler in stages:
+        reset_peak_rss()
+        start = time.perf_counter()
+        ranks = sampler()
+        seconds = time.perf_counter() - start
+        yield dict(info, stage=stage, seconds=seconds, peak_rss=peak_rss(),
+                   samples=samples, l1_error=l1_error(ranks, reference))
+
+    if num_pages <= reference_limit:
+        reset_peak_rss()
+        start = time.perf_counter()
+        ranks = iterate_pagerank(corpus, DAMPING)
+        seconds = time.perf_counter() - start
+        yield dict(info, stage="iterate", seconds=seconds, peak_rss=peak_rss(),
+                   tolerance=0.001, l1_error=l1_error(ranks, reference))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark PageRank crawling, sampling and iteration "
+                    "on generated power-law corpora, writing JSON lines."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--samples-per-page", type=int, default=10)
+    parser.add_argument("--crawl-limit", type=int, default=10 ** 5,
+                        help="largest corpus written out as HTML and crawled")
+    parser.add_argument("--reference-limit", type=int, default=10 ** 3,
+                        help="largest corpus for the original sample_pagerank "
+                             "and iterate_pagerank")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file for results, default stdout")
+    parser.add_argument("--run-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        results = sys.stdout
+
+        # The original sample_pagerank and iterate_pagerank print as they
+        # go, so keep their output out of the results
+        with contextlib.redirect_stdout(sys.stderr):
+            for result in run_size(args.run_size, args.samples_per_page,
+                                   args.crawl_limit, args.reference_limit,
+                                   args.seed):
+                results.write(json.dumps(result) + "\n")
+                results.flush()
+        return
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for num_pages in args.sizes:
+            # Each size runs in a fresh process so its memory is its own,
+            # and a size too large for this machine only loses its results
+            process = subprocess.run(
+                [sys.executable, __file__, "--run-size", str(num_pages),
+                 "--samples-per-page", str(args.samples_per_page),
+                 "--crawl-limit", str(args.crawl_limit),
+                 "--reference-limit", str(args.reference_limit),
+                 "--seed", str(args.seed)],
+                capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            for line in process.stdout.splitlines():
+                out.write(line + "\n")
+            if process.returncode != 0:
+                error = process.stderr.strip().splitlines() or ["killed"]
+                out.write(json.dumps({
+                    "pages": num_pages, "stage": "error",
+                    "returncode": process.returncode, "error": error[-1]
+                }) + "\n")
+            out.flush()
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
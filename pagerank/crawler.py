@@ -0,0 +1,219 @@
+import os
+import posixpath
+import re
+import sys
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from pagerank import DAMPING, power_iteration, stochastic_matrix
+
+# Same pattern as `crawl`
+LINK_PATTERN = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters read from a file at a time
+READ_CHUNK = 1 << 16
+
+# Longest unfinished tag carried over from one chunk to the next
+MAX_TAG = 1 << 16
+
+# Files parsed per task, and tasks in flight per worker
+FILES_PER_TASK = 256
+TASKS_PER_WORKER = 4
+
+
+class LinkGraph():
+    """
+    Link graph built incrementally as pages are parsed.
+
+    Every page name and link target is interned to an integer, and each
+    link is appended to a pair of integer arrays, so the graph costs a
+    few bytes per link rather than a set per page.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.index = {}
+        self.is_page = bytearray()
+        self.sources = array("i")
+        self.targets = array("i")
+
+    def intern(self, name):
+        """
+        Return the integer for `name`, assigning the next free one if it
+        has not been seen before.
+        """
+        number = self.index.get(name)
+        if number is None:
+            number = len(self.names)
+            self.index[name] = number
+            self.names.append(name)
+            self.is_page.append(0)
+        return number
+
+    def add_page(self, page, links):
+        """
+        Record that `page` exists and links to each name in `links`.
+        """
+        source = self.intern(page)
+        self.is_page[source] = 1
+        for link in links:
+            self.sources.append(source)
+            self.targets.append(self.intern(link))
+
+    def arrays(self):
+        """
+        Return the sorted list of pages and their links to other pages
+        in the corpus as CSR arrays, as returned by `pagerank.link_arrays`.
+        """
+        pages = sorted(
+            name for name, is_page in zip(self.names, self.is_page) if is_page
+        )
+        position = np.full(len(self.names), -1, dtype=np.int64)
+        position[[self.index[page] for page in pages]] = np.arange(len(pages))
+
+        # Keep only links to pages in the corpus, grouped by source page
+        sources = position[np.frombuffer(self.sources, dtype=np.int32)]
+        targets = position[np.frombuffer(self.targets, dtype=np.int32)]
+        keep = targets >= 0
+        sources, targets = sources[keep], targets[keep]
+        order = np.argsort(sources, kind="stable")
+
+        counts = np.bincount(sources, minlength=len(pages))
+        indptr = np.concatenate(([0], np.cumsum(counts)))
+        return pages, indptr, targets[order]
+
+    def corpus(self):
+        """
+        Return the graph in the dictionary form returned by `crawl`.
+        """
+        pages, indptr, indices = self.arrays()
+        return {
+            page: {pages[i] for i in indices[indptr[n]:indptr[n + 1]]}
+            for n, page in enumerate(pages)
+        }
+
+
+def crawl_concurrent(directory, workers=None):
+    """
+    Parse every HTML page under `directory`, including subdirectories,
+    across a pool of `workers` processes and return the LinkGraph.
+
+    Pages are named by their path relative to `directory`, and links are
+    resolved relative to the linking page, so a flat corpus gives the
+    same pages and links as `crawl`. Only a bounded number of tasks are
+    in flight at once, and files are read in chunks.
+    """
+    graph = LinkGraph()
+    workers = workers or os.cpu_count()
+    tasks = batches(html_files(directory), FILES_PER_TASK)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for task in tasks:
+            pending.add(executor.submit(extract_links, directory, task))
+            if len(pending) >= workers * TASKS_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                add_results(graph, done)
+        add_results(graph, pending)
+
+    return graph
+
+
+def add_results(graph, futures):
+    """
+    Add the pages parsed by finished `extract_links` tasks to `graph`.
+    """
+    for future in futures:
+        for page, links in future.result():
+            graph.add_page(page, links)
+
+
+def html_files(directory):
+    """
+    Generate the path of every .html file under `directory`, relative
+    to it and with / separators.
+    """
+    for root, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        relative = os.path.relpath(root, directory)
+        for filename in sorted(filenames):
+            if not filename.endswith(".html"):
+                continue
+            if relative != ".":
+                filename = os.path.join(relative, filename)
+            yield filename.replace(os.sep, "/")
+
+
+def batches(items, size):
+    """
+    Generate lists of up to `size` consecutive items.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def extract_links(directory, pages):
+    """
+    Return (page, links) for every page path in `pages`, where links are
+    the distinct other pages it links to, resolved relative to the page.
+    """
+    results = []
+    for page in pages:
+        base = posixpath.dirname(page)
+        links = set()
+        for href in read_hrefs(os.path.join(directory, page)):
+            links.add(posixpath.normpath(posixpath.join(base, href)))
+        links.discard(page)
+        results.append((page, sorted(links)))
+    return results
+
+
+def read_hrefs(path):
+    """
+    Generate the href of every link in the file at `path`, reading it in
+    chunks. A tag still open at the end of a chunk is carried over to
+    the next, so no link is missed or split.
+    """
+    carry = ""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            text = carry + chunk
+            if not chunk:
+                yield from LINK_PATTERN.findall(text)
+                return
+
+            # Hold back everything from the last tag if it is unclosed
+            cut = text.rfind("<")
+            closed = cut == -1 or text.find(">", cut) != -1
+            if closed or len(text) - cut > MAX_TAG:
+                cut = len(text)
+            yield from LINK_PATTERN.findall(text, 0, cut)
+            carry = text[cut:]
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python crawler.py corpus [workers]")
+    workers = int(sys.argv[2]) if len(sys.argv) == 3 else None
+    graph = crawl_concurrent(sys.argv[1], workers)
+    pages, indptr, indices = graph.arrays()
+    print(f"Crawled {len(pages)} pages with {len(indices)} links")
+
+    matrix, dangling = stochastic_matrix(indptr, indices)
+    ranks = power_iteration(matrix, dangling, DAMPING)
+    print(f"PageRank Results from Iteration")
+    for page, rank in zip(pages, ranks):
+        print(f"  {page}: {rank:.4f}")
+
+
+if __name__ == "__main__":
+    main()
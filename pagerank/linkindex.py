@@ -0,0 +1,162 @@
+import hashlib
+import os
+import pickle
+import sys
+
+from crawler import read_hrefs
+from pagerank import DAMPING, iterate_pagerank_sparse
+
+# Bump whenever the saved layout of LinkIndex changes, so that stale
+# indexes are rebuilt rather than loaded
+INDEX_VERSION = 1
+INDEX_NAME = ".pagerank-index.pickle"
+
+# Rankings kept in the cache, least recently used dropped first
+RANK_CACHE_SIZE = 16
+
+
+class LinkIndex():
+    """
+    On-disk index of the links in a directory of HTML pages.
+
+    Each file's links are stored with its size and modification time,
+    so a later crawl re-parses only the files that changed, and the
+    corpus built from them is kept until any file changes. Rankings
+    are cached by a hash of the link graph, the damping factor and the
+    tolerance, so an unchanged corpus is never ranked twice.
+    """
+
+    def __init__(self, directory, files=None, corpus=None, graph_hash=None,
+                 ranks=None):
+        self.directory = directory
+        self.files = files or {}
+        self.corpus = corpus or {}
+        self.graph_hash = graph_hash
+        self.ranks = ranks or {}
+        self.changed = False
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load the index saved in `directory`, or return an empty one if
+        there is none or it was written by another version.
+        """
+        path = os.path.join(directory, INDEX_NAME)
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                ValueError):
+            return cls(directory)
+
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return cls(directory)
+        return cls(directory, data["files"], data["corpus"],
+                   data["graph_hash"], data["ranks"])
+
+    def save(self):
+        """
+        Write the index to its directory if it changed since it was
+        loaded, replacing the previous one atomically.
+        """
+        if not self.changed:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "files": self.files,
+            "corpus": self.corpus,
+            "graph_hash": self.graph_hash,
+            "ranks": self.ranks
+        }
+        path = os.path.join(self.directory, INDEX_NAME)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        self.changed = False
+
+    def crawl(self):
+        """
+        Return the corpus of the directory, as returned by `crawl`,
+        parsing only the files that are new or whose size or
+        modification time changed since they were indexed.
+        """
+        files = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                filename = sys.intern(entry.name)
+                if not filename.endswith(".html"):
+                    continue
+                stat = entry.stat()
+                indexed = self.files.get(filename)
+                if (indexed is None or
+                        indexed[:2] != (stat.st_size, stat.st_mtime_ns)):
+                    # Interned names are stored once however many pages
+                    # link to them, keeping the index small
+                    links = frozenset(map(sys.intern, read_hrefs(entry.path)))
+                    links -= {filename}
+                    indexed = (stat.st_size, stat.st_mtime_ns, links)
+                files[filename] = indexed
+
+        if files != self.files or self.graph_hash is None:
+            # Only include links to other pages in the corpus, sharing
+            # the set of links when a page has no others
+            pages = set(files)
+            self.corpus = {}
+            for filename, (_, _, links) in files.items():
+                if not links <= pages:
+                    links = frozenset(pages.intersection(links))
+                self.corpus[filename] = links
+            self.files = files
+            self.graph_hash = graph_hash(self.corpus)
+            self.changed = True
+
+        return {filename: set(links) for filename, links in self.corpus.items()}
+
+    def pagerank(self, damping_factor, tolerance=0.001):
+        """
+        Return PageRank values for the corpus last returned by `crawl`,
+        as returned by `iterate_pagerank_sparse`, from the cache if it
+        holds them.
+        """
+        key = (self.graph_hash, damping_factor, tolerance)
+        ranks = self.ranks.pop(key, None)
+        if ranks is None:
+            ranks = iterate_pagerank_sparse(self.corpus, damping_factor,
+                                            tolerance)
+            self.changed = True
+        self.ranks[key] = ranks
+
+        while len(self.ranks) > RANK_CACHE_SIZE:
+            del self.ranks[next(iter(self.ranks))]
+        return ranks
+
+
+def graph_hash(corpus):
+    """
+    Return a hash of the pages and links of `corpus`, independent of the
+    order they are stored in.
+    """
+    digest = hashlib.sha256()
+    for page in sorted(corpus):
+        digest.update(page.encode("utf-8") + b"\0")
+        for link in sorted(corpus[page]):
+            digest.update(link.encode("utf-8") + b"\1")
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python linkindex.py corpus")
+    index = LinkIndex.load(sys.argv[1])
+    index.crawl()
+    ranks = index.pagerank(DAMPING)
+    index.save()
+    print(f"PageRank Results from Iteration")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
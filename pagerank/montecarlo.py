@@ -0,0 +1,164 @@
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import stats
+
+from pagerank import DAMPING, crawl, link_arrays
+
+# Confidence level of the reported intervals
+CONFIDENCE = 0.95
+
+# Steps taken by every walker between visit counts
+COUNT_STEPS = 64
+
+# Link arrays of the corpus in each worker process
+worker_links = None
+
+
+def monte_carlo_pagerank(corpus, damping_factor, n, walkers=1024,
+                         batches=16, seed=None, workers=1):
+    """
+    Estimate PageRank from about `n` samples taken by many random surfers
+    advanced in lockstep as NumPy arrays.
+
+    The samples are split into `batches` independent batches, each with
+    its own seeded generator, run in `workers` processes. Return two
+    dictionaries keyed by page: the estimated PageRank values (which
+    sum to 1), and the half-width of a confidence interval around
+    each value at the `CONFIDENCE` level, from the spread of the batch
+    estimates. Also return the number of samples actually taken.
+    """
+    pages, indptr, indices = link_arrays(corpus)
+    seeds = np.random.SeedSequence(seed).spawn(batches)
+
+    # Besides its fixed steps, every walker counts its starting page and
+    # then finishes its walk, which takes d / (1 - d) more visits on
+    # average. Use fewer walkers when `n` cannot cover that for them all
+    per_walker = 1 / (1 - damping_factor)
+    walkers = max(1, min(walkers, int(n / (batches * per_walker))))
+    steps = max(0, round(n / (batches * walkers) - per_walker))
+    tasks = [(damping_factor, walkers, steps, s) for s in seeds]
+
+    if workers == 1:
+        set_worker_links(indptr, indices)
+        counts = [walk_batch(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=set_worker_links,
+            initargs=(indptr, indices)
+        ) as executor:
+            counts = list(executor.map(walk_batch, *zip(*tasks)))
+    counts = np.array(counts, dtype=np.float64)
+
+    # Batches are independent, so the spread of their estimates gives the
+    # standard error of the pooled estimate
+    estimates = counts / counts.sum(axis=1, keepdims=True)
+    ranks = counts.sum(axis=0) / counts.sum()
+    quantile = stats.t.ppf((1 + CONFIDENCE) / 2, batches - 1)
+    errors = quantile * estimates.std(axis=0, ddof=1) / math.sqrt(batches)
+
+    return (
+        dict(zip(pages, ranks.tolist())),
+        dict(zip(pages, errors.tolist())),
+        int(counts.sum())
+    )
+
+
+def samples_for_error(n, errors, target_error):
+    """
+    Return roughly how many samples `monte_carlo_pagerank` needs for every
+    confidence interval to be within `target_error`, given the `errors`
+    it reported after taking `n` samples. Errors shrink with the square root of
+    the number of samples.
+    """
+    worst = max(errors.values())
+    return max(1, math.ceil(n * (worst / target_error) ** 2))
+
+
+def set_worker_links(indptr, indices):
+    """
+    Pool initializer: keep the corpus link arrays for `walk_batch`.
+    """
+    global worker_links
+    worker_links = (indptr, indices)
+
+
+def walk_batch(damping_factor, walkers, steps, seed):
+    """
+    Advance `walkers` random surfers from random pages for `steps` steps
+    and return how many times each page was visited, starts included.
+
+    A surfer's visits between two random jumps form a walk that starts
+    at a uniformly random page, and such walks visit pages in proportion
+    to their PageRank. So that the last walk is not cut short, each
+    surfer then continues until its next jump.
+    """
+    indptr, indices = worker_links
+    rng = np.random.default_rng(seed)
+    num_pages = len(indptr) - 1
+
+    positions = rng.integers(num_pages, size=walkers)
+    counts = np.bincount(positions, minlength=num_pages)
+
+    visited = np.empty((COUNT_STEPS, walkers), dtype=np.int64)
+    done = 0
+    while done < steps:
+        chunk = min(COUNT_STEPS, steps - done)
+        for step in range(chunk):
+            positions, _ = walk_step(
+                rng, indptr, indices, damping_factor, positions
+            )
+            visited[step] = positions
+        counts += np.bincount(visited[:chunk].ravel(), minlength=num_pages)
+        done += chunk
+
+    # Finish the current walks, without counting the jumps that end them
+    while len(positions):
+        positions, follows = walk_step(
+            rng, indptr, indices, damping_factor, positions
+        )
+        positions = positions[follows]
+        counts += np.bincount(positions, minlength=num_pages)
+
+    return counts
+
+
+def walk_step(rng, indptr, indices, damping_factor, positions):
+    """
+    Move every surfer one step. Return the new positions and whether
+    each surfer chose to follow a link rather than jump at random.
+
+    A surfer that chose to follow a link from a page without links moves
+    to any page at random, as in `transition_model`.
+    """
+    num_pages = len(indptr) - 1
+    degree = indptr[positions + 1] - indptr[positions]
+    follows = rng.random(len(positions)) < damping_factor
+
+    moves = rng.integers(num_pages, size=len(positions))
+    linked = np.flatnonzero(follows & (degree > 0))
+    offsets = (rng.random(len(linked)) * degree[linked]).astype(np.int64)
+    moves[linked] = indices[indptr[positions[linked]] + offsets]
+    return moves, follows
+
+
+def main():
+    if len(sys.argv) not in (3, 4):
+        sys.exit("Usage: python montecarlo.py corpus samples [workers]")
+    corpus = crawl(sys.argv[1])
+    n = int(sys.argv[2])
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else 1
+
+    ranks, errors, samples = monte_carlo_pagerank(corpus, DAMPING, n,
+                                                  workers=workers)
+    print(f"PageRank Results from Monte Carlo (n = {samples})")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f} ± {errors[page]:.4f}")
+    print(f"Samples for ±0.001: {samples_for_error(samples, errors, 0.001)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import os
+import sys
+
+import numpy as np
+
+from crawler import crawl_concurrent
+from pagerank import DAMPING, MAX_ITERATIONS, link_arrays
+
+# Page numbers are stored as 32-bit integers, allowing 2**31 pages
+PAGE_DTYPE = np.int32
+
+# Edges streamed from disk at a time during iteration
+BLOCK_EDGES = 1 << 22
+
+# Most edges sorted in memory at once while writing a graph
+SORT_EDGES = 1 << 24
+
+# Files making up a graph directory
+SOURCES_NAME = "sources.npy"
+TARGETS_NAME = "targets.npy"
+OUT_DEGREE_NAME = "out_degree.npy"
+PAGES_NAME = "pages.txt"
+
+
+def write_graph(directory, num_pages, edge_blocks, sort_edges=SORT_EDGES):
+    """
+    Write a link graph to `directory` as two binary arrays of source and
+    target page numbers, sorted by target and then source, along with
+    the out-degree of every page.
+
+    `edge_blocks` generates (sources, targets) pairs of page number
+    arrays. The edges are sorted out of core: memory use is
+    proportional to `num_pages` and `sort_edges`, not to the number of
+    edges. Returns the number of edges written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    out_degree = np.zeros(num_pages, dtype=np.int64)
+    in_degree = np.zeros(num_pages, dtype=np.int64)
+
+    # First pass: append the edges unsorted, counting degrees
+    unsorted_path = os.path.join(directory, "edges.tmp")
+    with open(unsorted_path, "wb") as f:
+        for sources, targets in edge_blocks:
+            block = np.empty((len(sources), 2), dtype=PAGE_DTYPE)
+            block[:, 0] = sources
+            block[:, 1] = targets
+            block.tofile(f)
+            np.add.at(out_degree, block[:, 0], 1)
+            np.add.at(in_degree, block[:, 1], 1)
+    num_edges = int(in_degree.sum())
+
+    # The edges into page p belong at offsets[p]:offsets[p + 1] of the
+    # sorted arrays. Split the pages into ranges whose edges fit in
+    # memory, each range owning one contiguous region of the output
+    offsets = np.concatenate(([0], np.cumsum(in_degree)))
+    bounds = [0]
+    while bounds[-1] < num_pages:
+        end = np.searchsorted(offsets, offsets[bounds[-1]] + sort_edges,
+                              side="right") - 1
+        bounds.append(min(max(end, bounds[-1] + 1), num_pages))
+    bounds = np.array(bounds)
+
+    paths = [os.path.join(directory, SOURCES_NAME),
+             os.path.join(directory, TARGETS_NAME)]
+    headers = []
+    for path in paths:
+        array = np.lib.format.open_memmap(
+            path, mode="w+", dtype=PAGE_DTYPE, shape=(num_edges,)
+        )
+        headers.append(array.offset)
+        del array
+    itemsize = np.dtype(PAGE_DTYPE).itemsize
+    outputs = [open(path, "r+b") for path in paths]
+
+    try:
+        # Second pass: move every edge into its range's region
+        cursors = offsets[bounds[:-1]].copy()
+        for start in range(0, num_edges, sort_edges):
+            length = min(sort_edges, num_edges - start)
+            block = np.array(read_block(unsorted_path, 0, 2 * start, 2 * length))
+            block = block.reshape(-1, 2)
+            ranges = np.searchsorted(bounds, block[:, 1], side="right") - 1
+            order = np.argsort(ranges, kind="stable")
+            counts = np.bincount(ranges, minlength=len(bounds) - 1)
+            position = 0
+            for number in np.flatnonzero(counts):
+                chosen = block[order[position:position + counts[number]]]
+                for column, (f, header) in enumerate(zip(outputs, headers)):
+                    f.seek(header + cursors[number] * itemsize)
+                    np.ascontiguousarray(chosen[:, column]).tofile(f)
+                cursors[number] += counts[number]
+                position += counts[number]
+
+        # Third pass: sort each region in memory
+        for f in outputs:
+            f.flush()
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            start, end = offsets[first], offsets[last]
+            sources, targets = [
+                np.array(read_block(path, header, start, end - start))
+                for path, header in zip(paths, headers)
+            ]
+            order = np.lexsort((sources, targets))
+            for f, header, values in zip(outputs, headers, (sources, targets)):
+                f.seek(header + start * itemsize)
+                values[order].tofile(f)
+    finally:
+        for f in outputs:
+            f.close()
+        os.remove(unsorted_path)
+
+    np.save(os.path.join(directory, OUT_DEGREE_NAME), out_degree)
+    return num_edges
+
+
+def csr_edge_blocks(indptr, indices, block_edges=BLOCK_EDGES):
+    """
+    Generate (sources, targets) blocks of at most `block_edges` edges
+    from links given as CSR arrays, as returned by `link_arrays`.
+    """
+    for start in range(0, len(indices), block_edges):
+        end = min(start + block_edges, len(indices))
+        positions = np.arange(start, end)
+        sources = np.searchsorted(indptr, positions, side="right") - 1
+        yield sources, indices[start:end]
+
+
+def write_pages(directory, pages):
+    """
+    Write the page names, in page number order, to pages.txt.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, PAGES_NAME), "w",
+              encoding="utf-8") as f:
+        for page in pages:
+            f.write(page + "\n")
+
+
+def write_corpus(directory, corpus):
+    """
+    Write a corpus, as returned by `crawl`, to `directory` with
+    `write_graph`, and its sorted page names to pages.txt.
+    """
+    pages, indptr, indices = link_arrays(corpus)
+    write_pages(directory, pages)
+    write_graph(directory, len(pages), csr_edge_blocks(indptr, indices))
+
+
+def read_block(path, offset, start, length):
+    """
+    Map `length` page numbers from index `start` of the array starting
+    `offset` bytes into the file at `path`.
+
+    A block is mapped on its own and released once dropped, so reading
+    a whole array never keeps more than a block of it resident.
+    """
+    itemsize = np.dtype(PAGE_DTYPE).itemsize
+    return np.memmap(path, dtype=PAGE_DTYPE, mode="r",
+                     offset=offset + start * itemsize, shape=(length,))
+
+
+def edge_array(directory, name):
+    """
+    Return the path, data offset and length of an edge array.
+    """
+    path = os.path.join(directory, name)
+    array = np.load(path, mmap_mode="r")
+    offset, length = array.offset, len(array)
+    del array
+    return path, offset, length
+
+
+def power_iteration_outofcore(directory, damping_factor, tolerance=0.001,
+                              max_iterations=MAX_ITERATIONS,
+                              block_edges=BLOCK_EDGES, callback=None):
+    """
+    Return the PageRank vector of the graph written to `directory` by
+    `write_graph`, iterating as `power_iteration` does until no value
+    changes by more than `tolerance`.
+
+    Each iteration streams the edge arrays from disk in blocks of
+    `block_edges`, so memory use is a few arrays of one value per page
+    however many edges there are. If given, `callback` is called as
+    callback(iteration, change) after every iteration.
+    """
+    out_degree = np.load(os.path.join(directory, OUT_DEGREE_NAME))
+    sources_path, sources_offset, num_edges = edge_array(
+        directory, SOURCES_NAME
+    )
+    targets_path, targets_offset, _ = edge_array(directory, TARGETS_NAME)
+
+    num_pages = len(out_degree)
+    dangling = out_degree == 0
+    weights = 1 / np.maximum(out_degree, 1)
+    ranks = np.full(num_pages, 1 / num_pages)
+
+    for iteration in range(1, max_iterations + 1):
+        # Rank each page passes along every one of its links
+        shares = ranks * weights
+        new_ranks = np.zeros(num_pages)
+        for start in range(0, num_edges, block_edges):
+            length = min(block_edges, num_edges - start)
+            sources = read_block(sources_path, sources_offset, start, length)
+            targets = read_block(targets_path, targets_offset, start, length)
+
+            # Edges are sorted by target, so a block's targets form one
+            # contiguous range of pages
+            first, last = targets[0], targets[-1] + 1
+            new_ranks[first:last] += np.bincount(
+                targets - first, weights=shares[sources],
+                minlength=last - first
+            )
+            del sources, targets
+
+        dangling_rank = ranks[dangling].sum()
+        new_ranks = (
+            (1 - damping_factor) / num_pages +
+            damping_factor * (new_ranks + dangling_rank / num_pages)
+        )
+        change = np.abs(new_ranks - ranks).max()
+        ranks = new_ranks
+        if callback is not None:
+            callback(iteration, change)
+        if change <= tolerance:
+            break
+
+    # Guard against rounding drift over many iterations
+    return ranks / ranks.sum()
+
+
+def iterate_pagerank_outofcore(directory, damping_factor, tolerance=0.001):
+    """
+    Return PageRank values for a corpus written by `write_corpus`, as a
+    dictionary like the one returned by `iterate_pagerank`.
+    """
+    with open(os.path.join(directory, PAGES_NAME), encoding="utf-8") as f:
+        pages = f.read().splitlines()
+    ranks = power_iteration_outofcore(directory, damping_factor, tolerance)
+    return dict(zip(pages, ranks.tolist()))
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python outofcore.py corpus graph_directory")
+
+    # The crawler keeps links as compact integer arrays, so the graph is
+    # written without ever building a dictionary of sets
+    pages, indptr, indices = crawl_concurrent(sys.argv[1]).arrays()
+    write_pages(sys.argv[2], pages)
+    write_graph(sys.argv[2], len(pages), csr_edge_blocks(indptr, indices))
+
+    ranks = iterate_pagerank_outofcore(sys.argv[2], DAMPING)
+    print(f"PageRank Results from Out-of-Core Iteration")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from outofcore import (BLOCK_EDGES, OUT_DEGREE_NAME, csr_edge_blocks,
+                       power_iteration_outofcore, write_graph)
+from pagerank import DAMPING, power_iteration, stochastic_matrix
+
+
+def generate(num_pages, num_edges, seed=0, block_edges=BLOCK_EDGES):
+    """
+    Generate (sources, targets) blocks of a random graph whose in-degrees
+    follow a power law, as on the web: a few pages receive most links.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, num_edges, block_edges):
+        size = min(block_edges, num_edges - start)
+        sources = rng.integers(num_pages, size=size)
+        targets = (num_pages * rng.random(size) ** 3).astype(np.int64)
+        yield sources, targets
+
+
+def measure(directory, tolerance):
+    """
+    Rank the graph in `directory` in this process and print the elapsed
+    time, iterations and peak resident memory as JSON.
+    """
+    changes = []
+    start = time.perf_counter()
+    power_iteration_outofcore(
+        directory, DAMPING, tolerance,
+        callback=lambda iteration, change: changes.append(change)
+    )
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "seconds": elapsed, "iterations": len(changes), "peak_rss": peak_rss()
+    }))
+
+
+def peak_rss():
+    """
+    Return the peak resident memory of this process in bytes.
+    """
+    # ru_maxrss survives exec on Linux, so a child started by a large
+    # parent would report the parent's peak; VmHWM starts afresh
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def check(num_pages, num_edges, tolerance):
+    """
+    Compare out-of-core iteration with in-memory `power_iteration` on a
+    small generated graph, returning the largest difference in rank.
+    """
+    sources, targets = map(np.concatenate, zip(*generate(num_pages, num_edges)))
+    order = np.argsort(sources, kind="stable")
+    indptr = np.concatenate(([0], np.cumsum(
+        np.bincount(sources, minlength=num_pages)
+    )))
+    matrix, dangling = stochastic_matrix(indptr, targets[order])
+    expected = power_iteration(matrix, dangling, DAMPING, tolerance)
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_graph(directory, num_pages, csr_edge_blocks(indptr, targets[order]),
+                    sort_edges=num_edges // 7)
+        ranks = power_iteration_outofcore(directory, DAMPING, tolerance,
+                                          block_edges=num_edges // 5)
+    return np.abs(ranks - expected).max()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark out-of-core PageRank on a generated graph."
+    )
+    parser.add_argument("--pages", type=int, default=10_000_000)
+    parser.add_argument("--edges", type=int, default=100_000_000)
+    parser.add_argument("--tolerance", type=float, default=1e-10)
+    parser.add_argument("--directory",
+                        help="reuse or keep the generated graph here")
+    parser.add_argument("--measure", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.directory, args.tolerance)
+        return
+
+    difference = check(10_000, 100_000, args.tolerance)
+    print(f"Largest difference from in-memory iteration: {difference:.2e}")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.directory or scratch
+        if not os.path.exists(os.path.join(directory, OUT_DEGREE_NAME)):
+            print(f"Writing {args.edges} edges between {args.pages} pages...")
+            start = time.perf_counter()
+            write_graph(directory, args.pages,
+                        generate(args.pages, args.edges))
+            elapsed = time.perf_counter() - start
+            print(f"Written in {elapsed:.1f}s, "
+                  f"peak RSS {peak_rss() / 2 ** 20:.0f} MB")
+
+        size = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory)
+        )
+
+        # Iterate in a fresh process so peak memory is its own
+        output = subprocess.run(
+            [sys.executable, __file__, "--measure", "--directory", directory,
+             "--tolerance", str(args.tolerance)],
+            check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f"Graph on disk: {size / 2 ** 20:.0f} MB")
+        print(f"Ranked in {result['seconds']:.1f}s "
+              f"({result['iterations']} iterations, "
+              f"{result['seconds'] / result['iterations']:.2f}s each), "
+              f"peak RSS {result['peak_rss'] / 2 ** 20:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,38 @@ import os
 import random
 import re
 import sys
+from collections import deque
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve_triangular
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Random numbers drawn at a time by the fast samplers
+SAMPLE_BLOCK = 1 << 16
+
+# Iterations after which `power_iteration` stops, converged or not
+MAX_ITERATIONS = 1000
+
+# Power iterations between quadratic extrapolations
+EXTRAPOLATION_PERIOD = 10
+
+# Once `update_pagerank` pushes from more than this fraction of pages at
+# a time, a whole matrix product is cheaper than gathering their links
+DENSE_PUSH_FRACTION = 0.05
+
 
 def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python pagerank.py corpus")
     corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    ranks = sample_pagerank_fast(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    ranks = iterate_pagerank_sparse(corpus, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
@@ -48,33 +66,36 @@ def crawl(directory):
     return pages
 
 
-def transition_model(corpus, page, damping_factor):
+def transition_model(corpus, page, damping_factor, teleport=None):
     """
     Return a probability distribution over which page to visit next,
     given a current page.
 
     With probability `damping_factor`, choose a link at random
     linked to by `page`. With probability `1 - damping_factor`, choose
-    a link at random chosen from all pages in the corpus.
+    a link at random chosen from all pages in the corpus, or from the
+    `teleport` distribution if given: a dictionary mapping pages to
+    probabilities that sum to 1.
     """
+    # Without a teleport distribution, every page is equally likely:
+    if teleport is None:
+        teleport = {page_name: 1 / len(corpus) for page_name in corpus}
+
     # Initialise probability distribution dictionary:
     prob_dist = {page_name : 0 for page_name in corpus}
 
-    # If page has no links, return equal probability for the corpus:
+    # If page has no links, return the teleport distribution:
     if len(corpus[page]) == 0:
         for page_name in prob_dist:
-            prob_dist[page_name] = 1 / len(corpus)
+            prob_dist[page_name] = teleport.get(page_name, 0)
         return prob_dist
 
-    # Probability of picking any page at random:
-    random_prob = (1 - damping_factor) / len(corpus)
-
     # Probability of picking a link from the page:
     link_prob = damping_factor / len(corpus[page])
 
     # Add probabilities to the distribution:
     for page_name in prob_dist:
-        prob_dist[page_name] += random_prob
+        prob_dist[page_name] += (1 - damping_factor) * teleport.get(page_name, 0)
 
         if page_name in corpus[page]:
             prob_dist[page_name] += link_prob
@@ -82,7 +103,6 @@ def transition_model(corpus, page, damping_factor):
     return prob_dist
 
 
-
 def sample_pagerank(corpus, damping_factor, n):
     """
     Return PageRank values for each page by sampling `n` pages
@@ -123,10 +143,53 @@ def sample_pagerank(corpus, damping_factor, n):
     return page_ranks
 
 
-def iterate_pagerank(corpus, damping_factor):
+def sample_pagerank_fast(corpus, damping_factor, n, seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages, like
+    `sample_pagerank`, but in constant time per sample.
+
+    Each page's links are turned into a list of page indices once, and
+    each step then makes one random follow-or-teleport choice and one
+    uniform choice, instead of building the whole transition model.
+    Random numbers are drawn from NumPy in blocks; pass `seed` for a
+    reproducible sample.
+    """
+    rng = np.random.default_rng(seed)
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    links = [[index[link] for link in sorted(corpus[page])] for page in pages]
+    num_pages = len(pages)
+    visits = [0] * num_pages
+
+    # First page choice is picked at random:
+    curr_page = int(rng.integers(num_pages))
+    visits[curr_page] += 1
+
+    remaining = n - 1
+    while remaining > 0:
+        block = min(remaining, SAMPLE_BLOCK)
+        follows = (rng.random(block) < damping_factor).tolist()
+        choices = rng.random(block).tolist()
+        remaining -= block
+
+        for follow, choice in zip(follows, choices):
+            page_links = links[curr_page]
+
+            # Follow a link with probability `damping_factor`, otherwise
+            # (or from a page without links) jump to any page at random:
+            if follow and page_links:
+                curr_page = page_links[int(choice * len(page_links))]
+            else:
+                curr_page = int(choice * num_pages)
+            visits[curr_page] += 1
+
+    return {page: visits[i] / n for i, page in enumerate(pages)}
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=0.001):
     """
     Return PageRank values for each page by iteratively updating
-    PageRank values until convergence.
+    PageRank values until no value changes by more than `tolerance`.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
@@ -141,10 +204,10 @@ def iterate_pagerank(corpus, damping_factor):
     # Initial page_rank gives every page a rank of 1/(num pages in corpus)
     page_ranks = {page_name: init_rank for page_name in corpus}
     new_ranks = {page_name: None for page_name in corpus}
-    max_rank_change = init_rank
+    max_rank_change = float("inf")
 
-    # Iteratively calculate page rank until no change > 0.001
-    while max_rank_change > 0.001:
+    # Iteratively calculate page rank until no change > tolerance
+    while max_rank_change > tolerance:
 
         iterations += 1
         max_rank_change = 0
@@ -164,7 +227,8 @@ def iterate_pagerank(corpus, damping_factor):
 
         # Normalise the new page ranks:
         norm_factor = sum(new_ranks.values())
-        new_ranks = {page: (rank / norm_factor) for page, rank in new_ranks.items()}
+        for page_name in new_ranks:
+            new_ranks[page_name] /= norm_factor
 
         # Find max change in page rank:
         for page_name in corpus:
@@ -172,8 +236,9 @@ def iterate_pagerank(corpus, damping_factor):
             if rank_change > max_rank_change:
                 max_rank_change = rank_change
 
-        # Update page ranks to the new ranks:
-        page_ranks = new_ranks.copy()
+        # Update page ranks to the new ranks, reusing the old dictionary
+        # for the next iteration's values:
+        page_ranks, new_ranks = new_ranks, page_ranks
 
     print('Iteration took', iterations, 'iterations to converge')
     print('Sum of iteration page ranks: ', round(sum(page_ranks.values()), 4))
@@ -181,6 +246,426 @@ def iterate_pagerank(corpus, damping_factor):
     return page_ranks
 
 
+def link_arrays(corpus):
+    """
+    Return the sorted list of pages in `corpus` and its links as CSR
+    arrays of page indices: the pages linked to by page i are
+    `indices[indptr[i]:indptr[i + 1]]`.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+
+    out_degree = np.fromiter(
+        (len(corpus[page]) for page in pages), dtype=np.int64, count=len(pages)
+    )
+    indptr = np.concatenate(([0], np.cumsum(out_degree)))
+    indices = np.fromiter(
+        (index[link] for page in pages for link in sorted(corpus[page])),
+        dtype=np.int64, count=indptr[-1]
+    )
+    return pages, indptr, indices
+
+
+def link_matrix(corpus):
+    """
+    Return the sorted list of pages in `corpus`, the column-stochastic
+    sparse matrix whose column j spreads the rank of page j evenly over
+    the pages it links to, and a boolean array marking pages without links.
+    """
+    pages, indptr, indices = link_arrays(corpus)
+    matrix, dangling = stochastic_matrix(indptr, indices)
+    return pages, matrix, dangling
+
+
+def stochastic_matrix(indptr, indices):
+    """
+    Return the column-stochastic link matrix and the dangling page mask
+    for links given as CSR arrays, as returned by `link_arrays`.
+    """
+    num_pages = len(indptr) - 1
+    out_degree = np.diff(indptr)
+
+    # Column j lists the pages linked to by page j, so the matrix is
+    # first built column-wise and then converted for fast products
+    weights = np.repeat(1 / np.maximum(out_degree, 1), out_degree)
+    matrix = sparse.csc_matrix(
+        (weights, indices, indptr), shape=(num_pages, num_pages)
+    ).tocsr()
+    dangling = out_degree == 0
+    return matrix, dangling
+
+
+def iterate_pagerank_sparse(corpus, damping_factor, tolerance=0.001,
+                            method="jacobi", norm="max",
+                            max_iterations=MAX_ITERATIONS, callback=None):
+    """
+    Return PageRank values for each page by damped power iteration over
+    a sparse link matrix, until no value changes by more than `tolerance`.
+    See `power_iteration` for the other options.
+
+    Pages without links spread their rank evenly over the whole corpus,
+    as in `iterate_pagerank`. Return a dictionary where keys are page
+    names, and values are their estimated PageRank value (a value
+    between 0 and 1). All PageRank values should sum to 1.
+    """
+    pages, matrix, dangling = link_matrix(corpus)
+    ranks = power_iteration(
+        matrix, dangling, damping_factor, tolerance,
+        method, norm, max_iterations, callback
+    )
+    return dict(zip(pages, ranks.tolist()))
+
+
+def power_iteration(matrix, dangling, damping_factor, tolerance=0.001,
+                    method="jacobi", norm="max",
+                    max_iterations=MAX_ITERATIONS, callback=None):
+    """
+    Return the PageRank vector for a link matrix and dangling page mask
+    from `stochastic_matrix`, iterating until the change in the ranks
+    is at most `tolerance`, or for at most `max_iterations` iterations.
+
+    `method` is "jacobi" for plain power iteration, "gauss-seidel" to
+    use each page's new rank within the same sweep, or "quadratic" for
+    power iteration with periodic quadratic extrapolation. The change is
+    measured as the largest change of any one rank if `norm` is "max",
+    or as the sum of all changes if it is "l1". If given, `callback` is
+    called as callback(iteration, change) after every iteration.
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"unknown method {method!r}")
+    if norm not in NORMS:
+        raise ValueError(f"unknown norm {norm!r}")
+    measure = NORMS[norm]
+
+    steps = SOLVERS[method](matrix, dangling, damping_factor)
+    ranks = next(steps)
+    for iteration in range(1, max_iterations + 1):
+        new_ranks = next(steps)
+        change = measure(new_ranks - ranks)
+        ranks = new_ranks
+        if callback is not None:
+            callback(iteration, change)
+        if change <= tolerance:
+            break
+
+    # Guard against rounding drift over many iterations
+    return ranks / ranks.sum()
+
+
+def power_step(matrix, dangling, damping_factor, ranks):
+    """
+    Return the ranks after one damped power iteration step.
+    """
+    num_pages = len(ranks)
+    dangling_rank = ranks[dangling].sum()
+    return (
+        (1 - damping_factor) / num_pages +
+        damping_factor * (matrix @ ranks + dangling_rank / num_pages)
+    )
+
+
+def jacobi_steps(matrix, dangling, damping_factor):
+    """
+    Generate the rank vectors of plain power iteration, starting from
+    the uniform one.
+    """
+    num_pages = matrix.shape[0]
+    ranks = np.full(num_pages, 1 / num_pages)
+    while True:
+        yield ranks
+        ranks = power_step(matrix, dangling, damping_factor, ranks)
+
+
+def gauss_seidel_steps(matrix, dangling, damping_factor):
+    """
+    Generate normalized rank vectors of Gauss-Seidel sweeps, starting
+    from the uniform one.
+
+    As in `update_pagerank`, PageRank is proportional to the solution of
+    ranks = damping * matrix @ ranks + teleport for a uniform teleport,
+    which needs no dangling page term. Each sweep updates pages in order,
+    so a page already sees the new ranks of the pages before it: that is
+    a triangular solve with the lower part of the matrix.
+    """
+    num_pages = matrix.shape[0]
+    lower = (
+        sparse.identity(num_pages, format="csr") -
+        damping_factor * sparse.tril(matrix, format="csr")
+    ).tocsr()
+    upper = damping_factor * sparse.triu(matrix, k=1, format="csr")
+    teleport = 1 / num_pages
+
+    ranks = np.full(num_pages, teleport)
+    while True:
+        yield ranks / ranks.sum()
+        ranks = spsolve_triangular(lower, teleport + upper @ ranks, lower=True)
+
+
+def quadratic_steps(matrix, dangling, damping_factor):
+    """
+    Generate the rank vectors of power iteration, starting from the
+    uniform one, replacing every `EXTRAPOLATION_PERIOD`th with its
+    quadratic extrapolation from the iterates before it.
+    """
+    num_pages = matrix.shape[0]
+    ranks = np.full(num_pages, 1 / num_pages)
+    history = []
+    while True:
+        yield ranks
+        ranks = power_step(matrix, dangling, damping_factor, ranks)
+        history.append(ranks)
+        if len(history) == EXTRAPOLATION_PERIOD:
+            ranks = quadratic_extrapolation(*history[-4:])
+            history = []
+
+
+def quadratic_extrapolation(x0, x1, x2, x3):
+    """
+    Return the quadratic extrapolation of four successive rank vectors.
+
+    The error left after a few power steps lies mostly along the
+    matrix's next two eigenvectors. Fitting the characteristic
+    polynomial of those from the differences between the iterates lets
+    the extrapolation cancel them (Kamvar et al., 2003).
+    """
+    y1, y2, y3 = x1 - x0, x2 - x0, x3 - x0
+    gamma, _, _, _ = np.linalg.lstsq(
+        np.column_stack((y1, y2)), -y3, rcond=None
+    )
+    g1, g2, g3 = gamma[0], gamma[1], 1
+    ranks = (g1 + g2 + g3) * x1 + (g2 + g3) * x2 + g3 * x3
+    return ranks / ranks.sum()
+
+
+SOLVERS = {
+    "jacobi": jacobi_steps,
+    "gauss-seidel": gauss_seidel_steps,
+    "quadratic": quadratic_steps,
+}
+
+NORMS = {
+    "max": lambda change: np.abs(change).max(),
+    "l1": lambda change: np.abs(change).sum(),
+}
+
+
+def personalized_pagerank(corpus, damping_factor, teleport,
+                          tolerance=0.001, max_iterations=MAX_ITERATIONS):
+    """
+    Return personalized PageRank values for each page, like
+    `iterate_pagerank_sparse`, but with the random surfer jumping to a
+    page drawn from `teleport` instead of any page at random.
+
+    `teleport` is a seed page, a collection of seed pages jumped to with
+    equal probability, or a dictionary mapping pages to weights, such as
+    a topic's affinity for each page.
+    """
+    pages, ranks = personalized_pagerank_batch(
+        corpus, damping_factor, [teleport], tolerance, max_iterations
+    )
+    return dict(zip(pages, ranks[:, 0].tolist()))
+
+
+def personalized_pagerank_batch(corpus, damping_factor, teleports,
+                                tolerance=0.001,
+                                max_iterations=MAX_ITERATIONS):
+    """
+    Return the sorted list of pages in `corpus` and an array whose
+    column k holds the personalized PageRank for `teleports[k]`, each
+    given as for `personalized_pagerank`.
+
+    All the rankings are iterated together, so each iteration is a
+    single sparse product with one column per ranking rather than one
+    run per ranking.
+    """
+    pages, matrix, dangling = link_matrix(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    jumps = np.column_stack([
+        teleport_vector(index, teleport) for teleport in teleports
+    ])
+    ranks = personalized_iteration(
+        matrix, dangling, damping_factor, jumps, tolerance, max_iterations
+    )
+    return pages, ranks
+
+
+def personalized_iteration(matrix, dangling, damping_factor, teleport,
+                           tolerance=0.001, max_iterations=MAX_ITERATIONS):
+    """
+    Return personalized PageRank vectors for a link matrix and dangling
+    page mask from `stochastic_matrix`, one column for each column of
+    the `teleport` array of jump distributions, iterating until no value
+    changes by more than `tolerance`.
+
+    A page without links sends its rank to the teleport distribution,
+    so it stays with the pages the ranking is personalized to.
+    """
+    ranks = teleport.copy()
+    for _ in range(max_iterations):
+        jumped = (1 - damping_factor) + damping_factor * ranks[dangling].sum(axis=0)
+        new_ranks = damping_factor * (matrix @ ranks) + teleport * jumped
+        change = np.abs(new_ranks - ranks).max()
+        ranks = new_ranks
+        if change <= tolerance:
+            break
+
+    # Guard against rounding drift over many iterations
+    return ranks / ranks.sum(axis=0)
+
+
+def teleport_vector(index, teleport):
+    """
+    Return the jump distribution over pages numbered by `index` for a
+    teleport given as for `personalized_pagerank`.
+    """
+    if isinstance(teleport, str):
+        teleport = [teleport]
+    if isinstance(teleport, dict):
+        weights = teleport.items()
+    else:
+        weights = ((page, 1) for page in teleport)
+
+    vector = np.zeros(len(index))
+    for page, weight in weights:
+        if page not in index:
+            raise ValueError(f"{page} is not in the corpus")
+        if weight < 0:
+            raise ValueError(f"{page} has negative weight {weight}")
+        vector[index[page]] += weight
+
+    total = vector.sum()
+    if total == 0:
+        raise ValueError("teleport distribution has no weight")
+    return vector / total
+
+
+def push_pagerank(corpus, damping_factor, seed, epsilon=1e-6):
+    """
+    Return approximate personalized PageRank values for jumping to the
+    page `seed` alone, by pushing rank outwards from the seed along
+    links (Andersen, Chung and Lang, 2006).
+
+    Each push keeps `1 - damping_factor` of a page's unpushed rank and
+    shares the rest among its links, until every page holds less than
+    `epsilon` times its number of links. Only pages reached are visited
+    and returned, so the work depends on `epsilon` and not on the size
+    of the corpus. Values never exceed the exact ones, and fall short of
+    them in total by the rank left unpushed.
+    """
+    if seed not in corpus:
+        raise ValueError(f"{seed} is not in the corpus")
+
+    estimates = {}
+    residual = {seed: 1.0}
+    queue = deque([seed])
+    while queue:
+        page = queue.popleft()
+        rank = residual[page]
+        residual[page] = 0
+        estimates[page] = estimates.get(page, 0) + (1 - damping_factor) * rank
+
+        # A page without links sends its rank back to the seed
+        links = corpus[page] or (seed,)
+        share = damping_factor * rank / len(links)
+        for link in links:
+            before = residual.get(link, 0)
+            residual[link] = before + share
+
+            # Queue a page only when it first holds enough to push
+            threshold = epsilon * max(len(corpus[link]), 1)
+            if before < threshold <= before + share:
+                queue.append(link)
+
+    return estimates
+
+
+def apply_diff(corpus, diff):
+    """
+    Return a copy of `corpus` with the changes in `diff` applied.
+
+    `diff` is a dictionary with any of the keys "removed_pages" and
+    "added_pages" (iterables of pages), and "removed_links" and
+    "added_links" (iterables of (page, link) pairs). Removing a page also
+    removes every link to it. Pages are changed before links, and every
+    added link must join two pages of the resulting corpus.
+    """
+    removed_pages = set(diff.get("removed_pages", ()))
+    corpus = {
+        page: links - removed_pages
+        for page, links in corpus.items()
+        if page not in removed_pages
+    }
+    for page in diff.get("added_pages", ()):
+        corpus.setdefault(page, set())
+
+    for page, link in diff.get("removed_links", ()):
+        if page in corpus:
+            corpus[page].discard(link)
+    for page, link in diff.get("added_links", ()):
+        if page not in corpus or link not in corpus:
+            raise ValueError(f"link {page} -> {link} leaves the corpus")
+        if page != link:
+            corpus[page].add(link)
+
+    return corpus
+
+
+def update_pagerank(corpus, damping_factor, previous_ranks, tolerance=0.001):
+    """
+    Return PageRank values for `corpus`, like `iterate_pagerank_sparse`,
+    updating `previous_ranks` computed before the corpus changed.
+
+    Rather than iterating over every page, only the rank that is out of
+    balance is pushed along links, so the work is proportional to the
+    part of the corpus a change reaches. The residual left over, passing
+    on a damped share at every step, would add at most 1 / (1 - damping)
+    times its sum to the ranks, so pushing stops once that could change
+    no rank by more than `tolerance`.
+    """
+    pages, matrix, dangling = link_matrix(corpus)
+    columns = matrix.tocsc()
+    ranks = np.array([previous_ranks.get(page, 0.0) for page in pages])
+    kept = np.array([page in previous_ranks for page in pages])
+
+    # PageRank is proportional to the solution of
+    # ranks = damping * matrix @ ranks + teleport, since the rank of
+    # dangling pages and the random jump both reach every page equally.
+    # Every unchanged page already balances for the teleport its previous
+    # rank implies, so the residual is zero except near the changes
+    balance = ranks - damping_factor * (matrix @ ranks)
+    teleport = np.median(balance[kept]) if kept.any() else 1 / len(pages)
+    residual = teleport - balance
+
+    total = ranks.sum()
+    while True:
+        allowed = tolerance * (1 - damping_factor) * total
+        sizes = np.abs(residual)
+        if sizes.sum() <= allowed:
+            break
+
+        active = np.flatnonzero(sizes)
+
+        # Move each active page's residual into its rank, and pass the
+        # damped share of it on to the pages it links to
+        pushed = residual[active]
+        ranks[active] += pushed
+        total += pushed.sum()
+        residual[active] = 0
+
+        if len(active) > DENSE_PUSH_FRACTION * len(pages):
+            spread = np.zeros(len(pages))
+            spread[active] = pushed
+            residual += damping_factor * (matrix @ spread)
+        else:
+            links = columns[:, active]
+            shares = damping_factor * links.data * np.repeat(
+                pushed, np.diff(links.indptr)
+            )
+            residual += np.bincount(links.indices, weights=shares,
+                                    minlength=len(pages))
+
+    return dict(zip(pages, (ranks / ranks.sum()).tolist()))
+
 
 if __name__ == "__main__":
     main()